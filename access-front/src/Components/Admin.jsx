@@ -5,11 +5,23 @@ const Admin = () => {
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [adminId, setAdminId] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const token = localStorage.getItem("token");
 
   const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
+  // /admin/users está paginado: X-Next-Cursor indica desde dónde pedir la siguiente página
+  const fetchPage = async (afterId) => {
+    const params = afterId ? `?after_id=${afterId}` : "";
+    const res = await fetch(`${API_BASE}/admin/users${params}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    const data = await res.json();
+    setUsers((prev) => (afterId ? [...prev, ...data] : data));
+    setNextCursor(res.headers.get("X-Next-Cursor"));
+  };
+
   useEffect(() => {
     const fetchUsers = async () => {
       try {
@@ -23,11 +35,7 @@ const Admin = () => {
         }
         setAdminId(me.id);
 
-        const res = await fetch(`${API_BASE}/admin/users`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        const data = await res.json();
-        setUsers(data);
+        await fetchPage(null);
       } catch (err) {
         console.error("Error cargando usuarios:", err);
         window.location.href = "/";
@@ -119,6 +127,15 @@ const Admin = () => {
           ))}
         </tbody>
       </table>
+      {nextCursor && (
+        <button
+          onClick={() => fetchPage(nextCursor)}
+          className="bg-gray-800 text-white px-4 py-2 rounded hover:bg-gray-700"
+          style={{ margin: "16px 0" }}
+        >
+          Cargar más
+        </button>
+      )}
     </div>
   );
 };
@@ -12,4 +12,109 @@ export async function extractText(file) {
   
     if (!response.ok) throw new Error("Error en el servidor");
     return await response.json();
-  }
\ No newline at end of file
+  }
+
+// Subida por lotes (varias imágenes, TIFF multipágina o PDF). El servidor
+// responde NDJSON: se llama a onPage con cada página en cuanto llega y se
+// devuelve el resumen final ({status: "done", pages, errors}).
+export async function extractTextBatch(files, onPage) {
+    const formData = new FormData();
+    for (const file of files) formData.append('files', file);
+
+    const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+    const response = await fetch(`${API_BASE}/upload/batch`, {
+      method: 'POST',
+      body: formData
+    });
+
+    if (!response.ok) throw new Error("Error en el servidor");
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let summary = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const item = JSON.parse(line);
+        if (item.status === "done") summary = item;
+        else if (onPage) onPage(item);
+      }
+    }
+    return summary;
+  }
+
+// Lee una respuesta text/event-stream y llama a onEvent(evento, datos) por cada mensaje
+async function readServerEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split("\n\n");
+      buffer = messages.pop();
+      for (const message of messages) {
+        let event = "message";
+        let data = "";
+        for (const line of message.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  }
+
+// Corrección en streaming: onDelta recibe cada trozo de texto según lo genera
+// Gemini. Devuelve la respuesta final (igual que /verify-text); su
+// corrected_text es el definitivo y sustituye a lo acumulado con los deltas.
+export async function verifyTextStream(text, onDelta) {
+    const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+    const response = await fetch(`${API_BASE}/verify-text/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ text })
+    });
+
+    if (!response.ok) throw new Error("Error en el servidor");
+
+    let result = null;
+    await readServerEvents(response, (event, data) => {
+      if (event === "delta" && onDelta) onDelta(data.text);
+      else if (event === "done") result = data;
+    });
+    return result;
+  }
+
+// Descripción en streaming: igual que verifyTextStream, para /describe-image
+export async function describeImageStream(file, onDelta) {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+    const response = await fetch(`${API_BASE}/describe-image/stream`, {
+      method: 'POST',
+      body: formData
+    });
+
+    if (!response.ok) throw new Error("Error en el servidor");
+
+    let result = null;
+    await readServerEvents(response, (event, data) => {
+      if (event === "delta" && onDelta) onDelta(data.text);
+      else if (event === "done") result = data;
+    });
+    return result;
+  }
@@ -6,6 +6,10 @@ CREATE TABLE users (
     is_admin INTEGER DEFAULT 0
 );
 
+-- Búsqueda por prefijo de nombre en /admin/users (LIKE 'abc%'): text_pattern_ops
+-- permite usar el índice con cualquier collation
+CREATE INDEX users_username_prefix ON users (username text_pattern_ops);
+
 CREATE TABLE user_settings (
     id SERIAL PRIMARY KEY,
     user_id INTEGER UNIQUE REFERENCES users(id) ON DELETE CASCADE,
@@ -2,14 +2,17 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from dotenv import load_dotenv
 
 import schemas
-from database import get_db
+from cache import TimedCache
+from database import db_connection
+from passwords import password_hasher, HashQueueFull
+from ratelimit import RateLimiter
 
 load_dotenv()
 
@@ -17,22 +20,53 @@ SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Caché corta de usuarios autenticados (por worker). Al borrar o modificar un
+# usuario solo se invalida en el worker que atiende la petición: en los demás
+# el usuario borrado o el rol retirado siguen valiendo hasta AUTH_CACHE_TTL
+# segundos. Ese es el límite de revocación; bajarlo cuesta una consulta más
+# por petición autenticada cada vez que caduca.
+AUTH_CACHE_TTL  = int(os.getenv("AUTH_CACHE_TTL", "30"))
+principal_cache = TimedCache(maxsize=10000, ttl=timedelta(seconds=AUTH_CACHE_TTL))
+
+# Límites de intentos de login antes de gastar un hash bcrypt: por usuario
+# cuentan todos los intentos; por IP solo los fallidos, porque detrás de un
+# NAT o proxy (un aula entera) muchos usuarios legítimos comparten IP. Tras un
+# proxy, la IP del cliente sale de X-Forwarded-For solo si el proxy está en
+# FORWARDED_ALLOW_IPS (uvicorn / gunicorn_conf.py).
+LOGIN_RATE_WINDOW   = float(os.getenv("LOGIN_RATE_WINDOW", "60"))
+LOGIN_RATE_PER_USER = int(os.getenv("LOGIN_RATE_PER_USER", "10"))
+LOGIN_RATE_PER_IP   = int(os.getenv("LOGIN_RATE_PER_IP", "30"))       # intentos fallidos
+login_user_limiter  = RateLimiter(LOGIN_RATE_PER_USER, LOGIN_RATE_WINDOW)
+login_ip_limiter    = RateLimiter(LOGIN_RATE_PER_IP, LOGIN_RATE_WINDOW)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def _with_db(fn, *args):
+    # Ejecuta fn(db, *args) con una conexión del pool (pensado para run_in_threadpool)
+    with db_connection() as db:
+        return fn(db, *args)
 
 def get_user_by_username(db, username: str):
     with db.cursor() as cur:
         cur.execute("SELECT * FROM users WHERE username = %s", (username,))
         return cur.fetchone()
 
-def create_user(db, user_in: schemas.UserCreate):
-    hashed_pw = get_password_hash(user_in.password)
+def get_principal(db, username: str):
+    # Solo las columnas necesarias para autorizar (sin hashed_password)
+    with db.cursor() as cur:
+        cur.execute("SELECT id, username, is_admin FROM users WHERE username = %s", (username,))
+        return cur.fetchone()
+
+def invalidate_user(username: str):
+    # Solo este worker: en el resto caduca por AUTH_CACHE_TTL (ver principal_cache)
+    principal_cache.delete(username)
+
+def update_password_hash(db, user_id: int, hashed_pw: str):
+    with db.cursor() as cur:
+        cur.execute("UPDATE users SET hashed_password = %s WHERE id = %s", (hashed_pw, user_id))
+        db.commit()
+
+def create_user(db, user_in: schemas.UserCreate, hashed_pw: str):
     with db.cursor() as cur:
         # Crear usuario
         cur.execute(
@@ -48,19 +82,46 @@ def create_user(db, user_in: schemas.UserCreate):
         db.commit()
         return user
 
-def authenticate_user(db, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user['hashed_password']):
+async def authenticate_user(username: str, password: str):
+    user = await run_in_threadpool(_with_db, get_user_by_username, username)
+    if not user or not await password_hasher.verify(password, user['hashed_password']):
         return None
+    # Si BCRYPT_ROUNDS cambió, se rehace el hash ahora que conocemos la contraseña
+    if password_hasher.needs_rehash(user['hashed_password']):
+        try:
+            new_hash = await password_hasher.hash(password)
+            await run_in_threadpool(_with_db, update_password_hash, user['id'], new_hash)
+        except HashQueueFull:
+            pass  # se reintentará en el próximo login
     return user
 
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado, inténtalo de nuevo",
+        headers={"Retry-After": "2"},
+    )
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def check_login_rate(request: Request, username: str):
+    retry_after = login_ip_limiter.hit(_client_ip(request), record=False) or login_user_limiter.hit(username)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos de inicio de sesión, espera un momento",
+            headers={"Retry-After": str(retry_after)},
+        )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     payload = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     payload.update({"exp": expire})
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+# Dependencia síncrona: FastAPI la ejecuta en el threadpool y la consulta no bloquea el event loop
+def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
@@ -75,28 +136,45 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_username(db, token_data.username)
+    user = principal_cache.get(token_data.username)
+    if user is not None:
+        return user
+
+    # Solo se pide conexión al pool cuando el usuario no está en caché
+    with db_connection() as db:
+        user = get_principal(db, token_data.username)
     if user is None:
         raise credentials_exception
+    user = dict(user)
+    principal_cache.set(token_data.username, user)
     return user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=schemas.UserOut, status_code=201)
-def register(user_in: schemas.UserCreate, db=Depends(get_db)):
-    existing = get_user_by_username(db, user_in.username)
+async def register(user_in: schemas.UserCreate):
+    existing = await run_in_threadpool(_with_db, get_user_by_username, user_in.username)
     if existing:
         raise HTTPException(status_code=400, detail="El usuario ya existe")
-    user = create_user(db, user_in)
+    try:
+        hashed_pw = await password_hasher.hash(user_in.password)
+    except HashQueueFull:
+        raise hashing_busy()
+    user = await run_in_threadpool(_with_db, create_user, user_in, hashed_pw)
     return user
 
 @router.post("/login", response_model=schemas.Token)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db=Depends(get_db)
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    check_login_rate(request, form_data.username)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password)
+    except HashQueueFull:
+        raise hashing_busy()
     if not user:
+        login_ip_limiter.hit(_client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña inválidos",
@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_cache.py
+#
+# Micro-benchmark de la caché L1: tasa de aciertos con una carga sesgada (Zipf)
+# comparando la antigua expulsión FIFO con la LRU actual de cache.TimedCache.
+#
+# Uso (desde backend/):
+#     python -m benchmarks.bench_cache --ops 200000 --keys 5000 --size 200 --skew 1.1
+import sys
+import time
+import random
+import argparse
+import itertools
+from bisect import bisect
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache import TimedCache
+
+class FIFOCache:
+    # Réplica de la TimedCache original (expulsa la clave insertada primero)
+    def __init__(self, maxsize=100, ttl=timedelta(hours=1)):
+        self.cache   = {}
+        self.maxsize = maxsize
+        self.ttl     = ttl
+
+    def get(self, key):
+        if key not in self.cache:
+            return None
+        value, ts = self.cache[key]
+        if datetime.now() - ts > self.ttl:
+            del self.cache[key]
+            return None
+        return value
+
+    def set(self, key, value):
+        if len(self.cache) >= self.maxsize:
+            oldest = next(iter(self.cache))
+            del self.cache[oldest]
+        self.cache[key] = (value, datetime.now())
+
+def zipf_workload(n_ops: int, n_keys: int, skew: float, seed: int):
+    rng = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, n_keys + 1)]
+    cumulative = list(itertools.accumulate(weights))
+    total = cumulative[-1]
+    # Las claves populares se reparten al azar para no favorecer el orden de inserción
+    keys = [f"key-{i}" for i in range(n_keys)]
+    rng.shuffle(keys)
+    return [keys[bisect(cumulative, rng.random() * total)] for _ in range(n_ops)]
+
+def run(cache, workload, value: str):
+    hits = 0
+    start = time.perf_counter()
+    for key in workload:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, value)
+    elapsed = time.perf_counter() - start
+    return hits / len(workload), elapsed / len(workload) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tasa de aciertos de la caché L1")
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=5_000)
+    parser.add_argument("--size", type=int, default=200, help="maxsize de la caché")
+    parser.add_argument("--skew", type=float, default=1.1, help="exponente Zipf")
+    parser.add_argument("--value-bytes", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workload = zipf_workload(args.ops, args.keys, args.skew, args.seed)
+    value = "x" * args.value_bytes
+
+    print(f"{args.ops} operaciones, {args.keys} claves, maxsize={args.size}, zipf s={args.skew}")
+    for name, cache in (
+        ("fifo (original)", FIFOCache(maxsize=args.size)),
+        ("lru (TimedCache)", TimedCache(maxsize=args.size)),
+    ):
+        hit_rate, ns_per_op = run(cache, workload, value)
+        print(f"  {name:<18} aciertos {hit_rate:6.1%}   {ns_per_op:7.0f} ns/op")
+
+if __name__ == "__main__":
+    main()
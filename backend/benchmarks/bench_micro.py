@@ -0,0 +1,130 @@
+# backend/benchmarks/bench_micro.py
+#
+# Micro-benchmarks de las piezas que están en el camino de cada petición:
+# TimedCache (get/set), get_cache_key y la ruta OCR (preprocesado para
+# Tesseract y para Gemini Vision, y Tesseract si está instalado) con las
+# imágenes de extras/. Guarda y compara baselines como load_test.
+#
+# Uso (desde backend/):
+#     python -m benchmarks.bench_micro --repeat 30
+#     python -m benchmarks.bench_micro --save-baseline
+import os
+import sys
+import time
+import argparse
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# main se importa solo por get_cache_key: sin L2 ni ficheros en el directorio actual
+_tmp = tempfile.mkdtemp(prefix="bench_micro_")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(_tmp, "cache.sqlite3"))
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_tmp, "jobs.sqlite3"))
+
+from PIL import Image
+
+from cache import TimedCache
+from main import get_cache_key
+from preprocess import prepare_for_ocr, prepare_for_vision
+from benchmarks.report import BASELINES, summarize, print_table, save_baseline, compare_baseline
+
+EXTRAS = Path(__file__).resolve().parent.parent.parent / "extras"
+
+def measure(fn: Callable[[], object], repeat: int, number: int) -> List[float]:
+    # `repeat` muestras, cada una la media de `number` llamadas (en segundos por llamada)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+def bench_cache(repeat: int) -> Dict[str, List[float]]:
+    cache = TimedCache(maxsize=1000, maxbytes=16 * 1024 * 1024)
+    value = "x" * 2000
+    for i in range(1000):
+        cache.set(f"key-{i}", value)
+    counter = iter(range(10 ** 12))
+    return {
+        "cache_get_hit":  measure(lambda: cache.get("key-500"), repeat, 10_000),
+        "cache_get_miss": measure(lambda: cache.get("missing"), repeat, 10_000),
+        # Claves nuevas: cada set expulsa la entrada LRU
+        "cache_set_evict": measure(lambda: cache.set(f"new-{next(counter)}", value), repeat, 10_000),
+    }
+
+def bench_cache_key(repeat: int) -> Dict[str, List[float]]:
+    results = {}
+    for size in (1_000, 15_000, 100_000):
+        text = ("Texto de ejemplo con acentos: canción, pingüino. " * (size // 50 + 1))[:size]
+        results[f"cache_key_{size // 1000}k"] = measure(lambda: get_cache_key(text), repeat, 1_000)
+    return results
+
+def bench_ocr_path(repeat: int) -> Dict[str, List[float]]:
+    results: Dict[str, List[float]] = {}
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        pytesseract = None
+        print("Tesseract no está instalado: se omite ocr_tesseract")
+
+    for path in sorted(EXTRAS.glob("*.jpg")):
+        data = path.read_bytes()
+        name = path.stem[:12].lower().rstrip("_")
+
+        def decode():
+            img = Image.open(BytesIO(data))
+            img.load()
+            return img
+
+        img = decode()
+        results[f"decode_{name}"]      = measure(decode, repeat, 1)
+        results[f"prep_ocr_{name}"]    = measure(lambda: prepare_for_ocr(img), repeat, 1)
+        results[f"prep_vision_{name}"] = measure(lambda: prepare_for_vision(data, img), repeat, 1)
+        if pytesseract is not None:
+            from ocr_engine import OCR_CONFIG
+            prepared = prepare_for_ocr(img)
+            results[f"ocr_tesseract_{name}"] = measure(
+                lambda: pytesseract.image_to_string(prepared, config=OCR_CONFIG), max(3, repeat // 10), 1
+            )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de caché, claves y ruta OCR")
+    parser.add_argument("--repeat", type=int, default=30, help="muestras por benchmark")
+    parser.add_argument("--only", nargs="+", choices=["cache", "cache_key", "ocr"], default=["cache", "cache_key", "ocr"])
+    parser.add_argument("--baseline", default=str(BASELINES / "micro.json"))
+    parser.add_argument("--save-baseline", nargs="?", const=str(BASELINES / "micro.json"))
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)   # el preprocesado registra cada imagen
+
+    samples: Dict[str, List[float]] = {}
+    if "cache" in args.only:
+        samples.update(bench_cache(args.repeat))
+    if "cache_key" in args.only:
+        samples.update(bench_cache_key(args.repeat))
+    if "ocr" in args.only:
+        samples.update(bench_ocr_path(args.repeat))
+
+    # Sin throughput: aquí interesan las latencias por llamada
+    results = {name: summarize(values) for name, values in samples.items()}
+    print_table(results, unit="us")
+
+    config = {"repeat": args.repeat, "only": args.only}
+    if args.save_baseline:
+        save_baseline(Path(args.save_baseline), results, config)
+    elif Path(args.baseline).exists():
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerance:.0%}):")
+        if not compare_baseline(Path(args.baseline), results, args.tolerance, slack_ms=0.001):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
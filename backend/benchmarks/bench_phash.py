@@ -0,0 +1,136 @@
+# backend/benchmarks/bench_phash.py
+#
+# Micro-benchmark del índice de hashes perceptuales (multi-index hashing):
+# latencia de búsqueda por Hamming con cientos de miles de entradas, y
+# comprobación de que dHash reconoce una imagen recomprimida de extras/.
+#
+# Por defecto los hashes salen de páginas sintéticas (márgenes en blanco,
+# líneas de texto, algún bloque de imagen): comparten muchos bits, que es lo
+# que castiga al índice. Con --kind random se usan hashes uniformes.
+#
+# Uso (desde backend/):
+#     python -m benchmarks.bench_phash --entries 200000 --queries 1000
+import sys
+import time
+import random
+import argparse
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from phash import MultiIndexHash, dhash, PHASH_SIZE, PHASH_MAX_DISTANCE
+
+EXTRAS = Path(__file__).resolve().parent.parent.parent / "extras"
+
+PAGE = (170, 220)   # página sintética (ancho, alto) en píxeles
+
+def flip_bits(value: int, bits: int, flips: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(bits), flips):
+        value ^= 1 << bit
+    return value
+
+def synthetic_page(rng: random.Random) -> Image.Image:
+    # Página blanca con márgenes, párrafos de líneas de texto (palabras como
+    # rectángulos grises) que ocupan una parte de la altura y, a veces, una imagen
+    width, height = PAGE
+    img = Image.new("L", PAGE, 255)
+    draw = ImageDraw.Draw(img)
+    left, right = rng.randint(10, 25), width - rng.randint(10, 25)
+    top = rng.randint(12, 30)
+    bottom = top + int((height - top - 12) * rng.uniform(0.2, 1.0))
+    line_height = rng.randint(5, 9)
+    y = top
+    if rng.random() < 0.5:
+        # Título centrado
+        title = rng.randint(30, right - left)
+        x0 = left + (right - left - title) // 2
+        draw.rectangle((x0, y, x0 + title, y + line_height), fill=rng.randint(20, 80))
+        y += line_height * 3
+    while y + line_height < bottom:
+        if rng.random() < 0.08:
+            # Bloque de imagen o tabla
+            block = rng.randint(20, 60)
+            draw.rectangle((left, y, rng.randint(left + 40, right), min(bottom, y + block)), fill=rng.randint(60, 200))
+            y += block + line_height
+            continue
+        for _ in range(rng.randint(2, 8)):
+            if y + line_height >= bottom:
+                break
+            end = right if rng.random() < 0.8 else rng.randint(left + 10, right)
+            x = left
+            while x < end:
+                word = rng.randint(3, 18)
+                draw.rectangle((x, y, min(end, x + word), y + line_height // 2), fill=rng.randint(40, 140))
+                x += word + rng.randint(2, 4)
+            y += line_height
+        y += line_height   # separación entre párrafos
+    return img
+
+def rescan(img: Image.Image, rng: random.Random) -> Image.Image:
+    # La misma página escaneada o fotografiada otra vez: otro tamaño, algo de
+    # desenfoque, brillo distinto y JPEG
+    scale = rng.uniform(0.6, 1.4)
+    out = img.resize((int(img.width * scale), int(img.height * scale)))
+    out = out.filter(ImageFilter.GaussianBlur(rng.uniform(0, 1.2)))
+    out = out.point(lambda p: min(255, int(p * rng.uniform(0.9, 1.05) + 5)))
+    buf = BytesIO()
+    out.save(buf, format="JPEG", quality=rng.randint(30, 80))
+    return Image.open(buf)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de hashes perceptuales")
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--kind", choices=["documents", "random"], default="documents")
+    parser.add_argument("--flips", type=int, default=6, help="bits cambiados en las consultas positivas (--kind random)")
+    parser.add_argument("--max-distance", type=int, default=PHASH_MAX_DISTANCE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng  = random.Random(args.seed)
+    bits = PHASH_SIZE * PHASH_SIZE
+    index = MultiIndexHash(bits, args.max_distance)
+
+    start = time.perf_counter()
+    if args.kind == "documents":
+        pages = [synthetic_page(rng) for _ in range(args.queries)]
+        stored = [dhash(page) for page in pages]
+        stored += [dhash(synthetic_page(rng)) for _ in range(args.entries - len(stored))]
+        near = [dhash(rescan(page, rng)) for page in pages]
+        new = [dhash(synthetic_page(rng)) for _ in range(args.queries)]
+    else:
+        stored = [rng.getrandbits(bits) for _ in range(args.entries)]
+        near = [flip_bits(rng.choice(stored), bits, args.flips, rng) for _ in range(args.queries)]
+        new = [rng.getrandbits(bits) for _ in range(args.queries)]
+    print(f"{len(stored)} hashes ({args.kind}) generados en {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    for i, value in enumerate(stored):
+        index.add(value, f"key-{i}")
+    print(f"{len(index)} entradas de {bits} bits indexadas en {time.perf_counter() - start:.1f} s")
+    print(f"  cubo más grande: {index.largest_bucket()} entradas")
+
+    for label, queries in (("casi duplicados", near), ("sin coincidencia", new)):
+        found = 0
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            found += bool(index.search(query, args.max_distance))
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        mean = sum(latencies) / len(latencies) * 1e6
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+        print(f"  {label:<17} media {mean:8.1f} µs   p99 {p99:8.1f} µs   encontrados {found}/{len(queries)}")
+
+    for path in sorted(EXTRAS.glob("*.jpg")):
+        img = Image.open(path)
+        buf = BytesIO()
+        img.convert("RGB").resize((img.width // 2, img.height // 2)).save(buf, format="JPEG", quality=40)
+        distance = (dhash(img) ^ dhash(Image.open(buf))).bit_count()
+        print(f"  {path.name}: distancia tras reducir y recomprimir = {distance}")
+
+if __name__ == "__main__":
+    main()
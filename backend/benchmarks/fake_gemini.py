@@ -0,0 +1,139 @@
+# backend/benchmarks/fake_gemini.py
+#
+# Servidor gRPC que imita el GenerativeService de Gemini (GenerateContent y
+# StreamGenerateContent) con latencia y tasa de errores configurables, para
+# medir el backend sin gastar cuota ni depender de la red.
+#
+# Uso (desde backend/):
+#     python -m benchmarks.fake_gemini --port 50051 --latency 0.8 --jitter 0.3 --error-rate 0.05
+# y arrancar el backend con GEMINI_API_ENDPOINT=127.0.0.1:50051 (GEMINI_API_KEY
+# puede ser cualquier valor).
+import random
+import asyncio
+import argparse
+import logging
+
+import grpc
+from google.ai import generativelanguage_v1beta as glm
+
+logger = logging.getLogger("fake_gemini")
+
+SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+
+DESCRIPTION = (
+    "La imagen muestra un documento impreso con varios párrafos de texto en "
+    "español, un encabezado en negrita y una tabla en la parte inferior."
+)
+
+class FakeGemini:
+    def __init__(self, latency: float, jitter: float, error_rate: float, quota_rate: float,
+                 stream_chunks: int, seed: int):
+        self.latency       = latency
+        self.jitter        = jitter
+        self.error_rate    = error_rate
+        self.quota_rate    = quota_rate
+        self.stream_chunks = stream_chunks
+        self.rng           = random.Random(seed)
+        self.calls         = 0
+        self.errors        = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    async def _maybe_fail(self, context):
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.errors += 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "fake_gemini: error simulado")
+        if roll < self.error_rate + self.quota_rate:
+            self.errors += 1
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "fake_gemini: quota exceeded (simulado)")
+
+    def _answer(self, request: glm.GenerateContentRequest) -> str:
+        parts = [part for content in request.contents for part in content.parts]
+        if any(part.inline_data.data for part in parts):
+            return DESCRIPTION
+        # Corrección: se devuelve el texto a corregir (la última línea del prompt)
+        text = parts[-1].text if parts else ""
+        return text.rsplit("\n", 1)[-1].strip() or "True"
+
+    @staticmethod
+    def _usage(request: glm.GenerateContentRequest, answer: str) -> dict:
+        prompt_chars = sum(len(part.text) for content in request.contents for part in content.parts)
+        # Aproximación habitual: ~4 caracteres por token (+258 por imagen)
+        images = sum(1 for content in request.contents for part in content.parts if part.inline_data.data)
+        prompt = prompt_chars // 4 + 258 * images
+        output = len(answer) // 4 + 1
+        return {"prompt_token_count": prompt, "candidates_token_count": output, "total_token_count": prompt + output}
+
+    async def generate(self, request, context):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        await self._maybe_fail(context)
+        answer = self._answer(request)
+        return glm.GenerateContentResponse(
+            candidates=[{"content": {"parts": [{"text": answer}], "role": "model"}, "finish_reason": 1}],
+            usage_metadata=self._usage(request, answer),
+        )
+
+    async def stream(self, request, context):
+        # Primer token tras ~1/3 de la latencia; el resto repartido en trozos
+        self.calls += 1
+        delay = self._delay()
+        await asyncio.sleep(delay / 3)
+        await self._maybe_fail(context)
+        answer = self._answer(request)
+        words = answer.split(" ")
+        size = max(1, len(words) // self.stream_chunks)
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        pieces[-1] = pieces[-1].rstrip()
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            yield glm.GenerateContentResponse(
+                candidates=[{"content": {"parts": [{"text": piece}], "role": "model"}, "finish_reason": 1 if last else 0}],
+                usage_metadata=self._usage(request, answer) if last else None,
+            )
+            if not last:
+                await asyncio.sleep(delay * 2 / 3 / len(pieces))
+
+async def serve(fake: FakeGemini, host: str, port: int):
+    server = grpc.aio.server()
+    handlers = {
+        "GenerateContent": grpc.unary_unary_rpc_method_handler(
+            fake.generate,
+            request_deserializer=glm.GenerateContentRequest.deserialize,
+            response_serializer=glm.GenerateContentResponse.serialize,
+        ),
+        "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+            fake.stream,
+            request_deserializer=glm.GenerateContentRequest.deserialize,
+            response_serializer=glm.GenerateContentResponse.serialize,
+        ),
+    }
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE, handlers),))
+    server.add_insecure_port(f"{host}:{port}")
+    await server.start()
+    logger.info(
+        f"Gemini falso en {host}:{port} (latencia {fake.latency}s ± {fake.jitter}s, "
+        f"errores {fake.error_rate:.0%}, cuota {fake.quota_rate:.0%})"
+    )
+    await server.wait_for_termination()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor Gemini falso para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--latency", type=float, default=0.8, help="segundos por respuesta completa")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± segundos aleatorios")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de UNAVAILABLE (reintentable)")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="fracción de RESOURCE_EXHAUSTED")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeGemini(args.latency, args.jitter, args.error_rate, args.quota_rate, args.stream_chunks, args.seed)
+    asyncio.run(serve(fake, args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# backend/benchmarks/load_test.py
+#
+# Prueba de carga del backend: varios clientes concurrentes (bucle cerrado)
+# contra /upload, /verify-text, /describe-image y los endpoints de auth.
+# Informa de throughput y latencias p50/p95/p99 por escenario y compara con
+# una baseline guardada para detectar regresiones (código de salida 1).
+#
+# Entorno recomendado (desde backend/):
+#     docker compose up -d postgres                      # Postgres local (raíz del repo)
+#     python -m benchmarks.fake_gemini --latency 0.8 &   # Gemini falso
+#     GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=127.0.0.1:50051 \
+#         LOGIN_RATE_PER_USER=100000 LOGIN_RATE_PER_IP=100000 \
+#         uvicorn main:app --port 8000 &
+#     python -m benchmarks.load_test --concurrency 16 --duration 30 \
+#         --scenarios upload verify-text describe-image auth --baseline benchmarks/baselines/load.json
+#
+# Con --save-baseline se guarda el resultado como nueva baseline.
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.report import BASELINES, summarize, print_table, save_baseline, compare_baseline
+
+EXTRAS = Path(__file__).resolve().parent.parent.parent / "extras"
+
+TEXTS = [
+    "El sistema de gestion documental permite digitalizar los archivos del departamento y "
+    "consultarlos desde cualquier puesto. Los usuarios deben identificarse antes de acceder.",
+    "La reunion se celebrara el proximo martes en la sala de juntas. Se ruega puntualidad "
+    "y que cada asistente traiga la documentacion revisada.",
+    "Dear customer, we are pleased to inforrn you that your order has been shipped and "
+    "wiil arrive within three business days.",
+]
+
+def _images() -> List[bytes]:
+    images = [p.read_bytes() for p in sorted(EXTRAS.glob("*.jpg"))]
+    if not images:
+        raise SystemExit(f"No hay imágenes de ejemplo en {EXTRAS}")
+    return images
+
+def _unique_image(data: bytes) -> bytes:
+    # Bytes añadidos tras el final del JPEG: otro MD5 con la misma imagen
+    return data + uuid.uuid4().bytes
+
+async def upload(client: httpx.AsyncClient, state: Dict, unique: bool) -> httpx.Response:
+    data = random.choice(state["images"])
+    if unique:
+        data = _unique_image(data)
+    return await client.post("/upload", files={"file": ("sample.jpg", data, "image/jpeg")})
+
+async def verify_text(client: httpx.AsyncClient, state: Dict, unique: bool) -> httpx.Response:
+    text = random.choice(TEXTS)
+    if unique:
+        text += f" Ref. {uuid.uuid4().hex[:8]}."
+    return await client.post("/verify-text", json={"text": text})
+
+async def describe_image(client: httpx.AsyncClient, state: Dict, unique: bool) -> httpx.Response:
+    data = random.choice(state["images"])
+    if unique:
+        data = _unique_image(data)
+    return await client.post("/describe-image", files={"file": ("sample.jpg", data, "image/jpeg")})
+
+async def auth(client: httpx.AsyncClient, state: Dict, unique: bool) -> httpx.Response:
+    # Login (bcrypt) + petición autenticada
+    username, password = random.choice(state["users"])
+    resp = await client.post("/auth/login", data={"username": username, "password": password})
+    if resp.status_code != 200:
+        return resp
+    token = resp.json()["access_token"]
+    return await client.get("/me", headers={"Authorization": f"Bearer {token}"})
+
+async def setup_users(client: httpx.AsyncClient, state: Dict, count: int):
+    state["users"] = []
+    for _ in range(count):
+        username, password = f"bench_{uuid.uuid4().hex[:10]}", "bench-password"
+        resp = await client.post("/auth/register", json={"username": username, "password": password})
+        if resp.status_code != 201:
+            raise SystemExit(f"No se pudo registrar el usuario de prueba: {resp.status_code} {resp.text}")
+        state["users"].append((username, password))
+
+SCENARIOS = {
+    "upload":         upload,
+    "verify-text":    verify_text,
+    "describe-image": describe_image,
+    "auth":           auth,
+}
+
+async def run_scenario(client: httpx.AsyncClient, fn, state: Dict, concurrency: int,
+                       duration: float, requests: int, unique: bool) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    sent = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, sent
+        while True:
+            if requests:
+                if sent >= requests:
+                    return
+                sent += 1
+            elif time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                resp = await fn(client, state, unique)
+                ok = resp.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def main_async(args) -> int:
+    state = {"images": _images()}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, Dict[str, float]] = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        if "auth" in args.scenarios:
+            await setup_users(client, state, args.users)
+        for name in args.scenarios:
+            if args.warmup:
+                await run_scenario(client, SCENARIOS[name], state, args.concurrency, 0, args.warmup, args.unique)
+            print(f"→ {name}: {args.concurrency} clientes, "
+                  f"{f'{args.requests} peticiones' if args.requests else f'{args.duration:.0f}s'}")
+            results[name] = await run_scenario(
+                client, SCENARIOS[name], state, args.concurrency, args.duration, args.requests, args.unique
+            )
+
+    print()
+    print_table(results)
+    config = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline")}
+    if args.save_baseline:
+        save_baseline(Path(args.save_baseline), results, config)
+    if args.baseline and Path(args.baseline).exists() and not args.save_baseline:
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerance:.0%}):")
+        if not compare_baseline(Path(args.baseline), results, args.tolerance):
+            return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del backend")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["verify-text", "describe-image"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos por escenario")
+    parser.add_argument("--requests", type=int, default=0, help="peticiones por escenario (sustituye a --duration)")
+    parser.add_argument("--warmup", type=int, default=0, help="peticiones de calentamiento sin medir")
+    parser.add_argument("--unique", action="store_true", help="evita aciertos de caché (texto/imagen distintos)")
+    parser.add_argument("--users", type=int, default=20, help="usuarios de prueba para el escenario auth")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=str(BASELINES / "load.json"))
+    parser.add_argument("--save-baseline", nargs="?", const=str(BASELINES / "load.json"))
+    parser.add_argument("--tolerance", type=float, default=0.2, help="margen antes de marcar regresión")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sys.exit(asyncio.run(main_async(args)))
+
+if __name__ == "__main__":
+    main()
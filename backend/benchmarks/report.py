@@ -0,0 +1,107 @@
+# backend/benchmarks/report.py
+#
+# Utilidades comunes de los benchmarks: percentiles, resumen de latencias y
+# baselines en JSON para detectar regresiones entre ejecuciones.
+import os
+import sys
+import json
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASELINES = Path(__file__).resolve().parent / "baselines"
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Interpolación lineal entre rangos (como numpy.percentile por defecto)
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+def summarize(latencies: List[float], errors: int = 0, elapsed: Optional[float] = None) -> Dict[str, float]:
+    # Latencias en segundos; el resumen en milisegundos
+    values = sorted(latencies)
+    total = len(values) + errors
+    summary = {
+        "requests": total,
+        "errors":   errors,
+        "p50_ms":   round(percentile(values, 0.50) * 1000, 6),
+        "p95_ms":   round(percentile(values, 0.95) * 1000, 6),
+        "p99_ms":   round(percentile(values, 0.99) * 1000, 6),
+        "max_ms":   round(values[-1] * 1000, 6) if values else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(values) / elapsed, 2)
+    return summary
+
+def print_table(results: Dict[str, Dict[str, float]], unit: str = "ms"):
+    # unit="us" para operaciones de microsegundos (los valores se guardan siempre en ms)
+    scale = 1000 if unit == "us" else 1
+    with_rps = any("throughput_rps" in r for r in results.values())
+    header = f"{'escenario':<26}{'peticiones':>11}{'errores':>9}"
+    header += f"{'rps':>10}" if with_rps else ""
+    header += "".join(f"{f'{p} {unit}':>11}" for p in ("p50", "p95", "p99"))
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = f"{name:<26}{r['requests']:>11}{r['errors']:>9}"
+        line += f"{r.get('throughput_rps', 0):>10.1f}" if with_rps else ""
+        line += "".join(f"{r[key] * scale:>11.2f}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(line)
+
+def environment() -> Dict[str, object]:
+    # Las baselines solo son comparables en la misma máquina y configuración
+    return {
+        "date":     datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host":     platform.node(),
+        "python":   platform.python_version(),
+        "cpus":     os.cpu_count(),
+        "platform": platform.platform(),
+    }
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, float]], config: Dict[str, object]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(
+        {"environment": environment(), "config": config, "results": results},
+        indent=2, ensure_ascii=False
+    ) + "\n")
+    print(f"Baseline guardada en {path}")
+
+def compare_baseline(path: Path, results: Dict[str, Dict[str, float]], tolerance: float,
+                     slack_ms: float = 0.0) -> bool:
+    # Regresión: p95/p99 por encima de la baseline, throughput por debajo o más
+    # errores, más allá de la tolerancia. Un escenario sin baseline también es un
+    # fallo: si no, se daría por bueno sin haberlo comparado.
+    # slack_ms: margen absoluto para que el ruido de operaciones de microsegundos
+    # no cuente como regresión.
+    baseline = json.loads(path.read_text())
+    base_results = baseline["results"]
+    if baseline["environment"].get("host") != platform.node():
+        print(f"Aviso: la baseline se midió en otra máquina ({baseline['environment'].get('host')})", file=sys.stderr)
+
+    ok = True
+    for name, current in results.items():
+        base = base_results.get(name)
+        if base is None:
+            ok = False
+            print(f"  {name}: SIN BASELINE (grábala con --save-baseline)")
+            continue
+        problems = []
+        for metric in ("p95_ms", "p99_ms"):
+            if base.get(metric) and current[metric] > base[metric] * (1 + tolerance) + slack_ms:
+                problems.append(f"{metric} {base[metric]:.4g} -> {current[metric]:.4g}")
+        if base.get("throughput_rps") and current.get("throughput_rps", 0) < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"rps {base['throughput_rps']:.1f} -> {current.get('throughput_rps', 0):.1f}")
+        base_error_rate = base["errors"] / (base["requests"] or 1)
+        error_rate = current["errors"] / (current["requests"] or 1)
+        if error_rate > base_error_rate + tolerance / 10:
+            problems.append(f"errores {base_error_rate:.1%} -> {error_rate:.1%}")
+        if problems:
+            ok = False
+            print(f"  {name}: REGRESIÓN ({'; '.join(problems)})")
+        else:
+            print(f"  {name}: ok")
+    return ok
@@ -0,0 +1,336 @@
+# backend/cache.py
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")          # "memory" | "sqlite"
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.sqlite3")
+CACHE_L2_MAXSIZE_FACTOR = int(os.getenv("CACHE_L2_MAXSIZE_FACTOR", "50"))  # L2 = maxsize * factor
+CACHE_L2_TOUCH_EVERY = float(os.getenv("CACHE_L2_TOUCH_EVERY", "300"))      # segundos entre actualizaciones de accessed_at
+
+# --------------------------------------------------
+# Interfaz común de los backends de caché
+# --------------------------------------------------
+class CacheBackend:
+    name = "base"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+# --------------------------------------------------
+# L1: caché en memoria LRU con TTL (por proceso)
+# --------------------------------------------------
+class TimedCache(CacheBackend):
+    name = "memory"
+
+    # Cada cuántas operaciones se purgan entradas caducadas, y cuántas como máximo
+    SWEEP_EVERY = 64
+    SWEEP_LIMIT = 256
+
+    def __init__(self, maxsize=100, ttl=timedelta(hours=1), maxbytes: Optional[int] = None):
+        # cache: orden LRU (el primero es el menos usado recientemente)
+        # _expiry: orden de escritura; con un TTL fijo coincide con el orden de caducidad
+        self.cache: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self.maxsize     = maxsize
+        self.maxbytes    = maxbytes
+        self.ttl         = ttl
+        self.nbytes      = 0
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self.expirations = 0
+        self._ops        = 0
+        self._lock       = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._tick(now)
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        now  = time.monotonic()
+        size = sys.getsizeof(value)
+        if self.maxbytes is not None and size > self.maxbytes:
+            # No cabe: tampoco debe quedar el valor anterior de la clave
+            self.delete(key)
+            return
+        with self._lock:
+            self._tick(now)
+            if key in self.cache:
+                self._remove(key)
+            expires_at = now + self.ttl.total_seconds()
+            self.cache[key]   = (value, expires_at, size)
+            self._expiry[key] = expires_at
+            self.nbytes += size
+            while len(self.cache) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                lru_key = next(iter(self.cache))
+                self._remove(lru_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, _, size = self.cache.pop(key)
+        del self._expiry[key]
+        self.nbytes -= size
+
+    def _tick(self, now: float):
+        # Purga amortizada: unas pocas entradas caducadas cada SWEEP_EVERY operaciones
+        self._ops += 1
+        if self._ops % self.SWEEP_EVERY:
+            return
+        for _ in range(self.SWEEP_LIMIT):
+            if not self._expiry:
+                break
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def __len__(self):
+        return len(self.cache)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "bytes":       self.nbytes,
+            "evictions":   self.evictions,
+            "expirations": self.expirations,
+        }
+
+# --------------------------------------------------
+# L2: caché persistente en SQLite (compartida entre workers)
+# --------------------------------------------------
+class SQLiteCache(CacheBackend):
+    name = "sqlite"
+
+    # Cada cuántas escrituras se comprueba el límite de tamaño
+    EVICT_EVERY = 50
+
+    def __init__(self, namespace: str, maxsize: int = 10000, ttl=timedelta(hours=1), path: str = CACHE_DB_PATH):
+        self.namespace = namespace
+        self.maxsize   = maxsize
+        self.ttl       = ttl
+        self.path      = path
+        self.hits      = 0
+        self.misses    = 0
+        self.errors    = 0
+        self._writes   = 0
+        self._local    = threading.local()
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace   TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                expires_at  REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (namespace, accessed_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 no permite compartir conexiones entre hilos: una por hilo, y
+        # tampoco la heredada de otro proceso (fork de gunicorn --preload)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid  = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.misses += 1
+                return None
+            # accessed_at solo decide la expulsión: basta con refrescarlo de vez en
+            # cuando, y así una lectura no es una escritura (ni espera al lock de WAL)
+            if now - row[2] > CACHE_L2_TOUCH_EVERY:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key)
+                )
+            self.hits += 1
+            return row[0]
+        except sqlite3.Error as e:
+            # La L2 nunca debe tumbar una petición: se trata como fallo de caché
+            logger.warning(f"Error leyendo caché L2 ({self.namespace}): {e}")
+            self.errors += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, now + self.ttl.total_seconds(), now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Error escribiendo caché L2 ({self.namespace}): {e}")
+            self.errors += 1
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?", (self.namespace, now))
+        conn.execute("""
+            DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.namespace, self.namespace, self.maxsize))
+
+    def delete(self, key):
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Error borrando de caché L2 ({self.namespace}): {e}")
+            self.errors += 1
+
+    def __len__(self):
+        try:
+            return self._conn().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        return {**super().stats(), "errors": self.errors}
+
+# --------------------------------------------------
+# Caché de dos niveles: L1 en memoria delante de una L2 persistente
+# --------------------------------------------------
+class TieredCache(CacheBackend):
+    name = "tiered"
+
+    def __init__(self, l1: CacheBackend, l2: Optional[CacheBackend] = None):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key):
+        value = self.l1.get(key)
+        if value is not None or self.l2 is None:
+            return value
+        value = self.l2.get(key)
+        if value is not None:
+            # Promoción a L1 para las siguientes lecturas de este worker
+            self.l1.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.l1.set(key, value)
+        if self.l2 is not None:
+            self.l2.set(key, value)
+
+    # Versiones para código async: la L1 se consulta directamente y la L2
+    # (SQLite, puede esperar a un lock) en un hilo, fuera del event loop
+    async def aget(self, key):
+        value = self.l1.get(key)
+        if value is not None or self.l2 is None:
+            return value
+        value = await asyncio.to_thread(self.l2.get, key)
+        if value is not None:
+            self.l1.set(key, value)
+        return value
+
+    async def aset(self, key, value):
+        self.l1.set(key, value)
+        if self.l2 is not None:
+            await asyncio.to_thread(self.l2.set, key, value)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        if self.l2 is not None:
+            self.l2.delete(key)
+
+    def __len__(self):
+        return len(self.l1)
+
+    def stats(self):
+        tiers = {"l1": self.l1.stats()}
+        if self.l2 is not None:
+            tiers["l2"] = self.l2.stats()
+        return tiers
+
+def make_cache(namespace: str, maxsize: int, ttl: timedelta, maxbytes: Optional[int] = None) -> TieredCache:
+    l1 = TimedCache(maxsize=maxsize, ttl=ttl, maxbytes=maxbytes)
+    if CACHE_BACKEND == "memory":
+        return TieredCache(l1)
+    try:
+        l2 = SQLiteCache(namespace, maxsize=maxsize * CACHE_L2_MAXSIZE_FACTOR, ttl=ttl)
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudo abrir la caché L2 en {CACHE_DB_PATH}: {e}. Solo se usará memoria")
+        return TieredCache(l1)
+    return TieredCache(l1, l2)
+
+def make_shared_cache(namespace: str, maxsize: int, ttl: timedelta) -> CacheBackend:
+    # Solo la L2 compartida, sin L1 por worker que pueda quedar obsoleta: lo que
+    # escribe un worker lo lee cualquier otro en la siguiente petición. Con
+    # CACHE_BACKEND=memory (un solo proceso) basta una TimedCache.
+    if CACHE_BACKEND == "memory":
+        return TimedCache(maxsize=maxsize, ttl=ttl)
+    try:
+        return SQLiteCache(namespace, maxsize=maxsize, ttl=ttl)
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudo abrir la caché L2 en {CACHE_DB_PATH}: {e}. Solo se usará memoria")
+        return TimedCache(maxsize=maxsize, ttl=ttl)
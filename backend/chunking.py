@@ -0,0 +1,104 @@
+# backend/chunking.py
+import os
+import re
+import zlib
+from typing import List, NamedTuple
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+CHUNK_MAX_CHARS = int(os.getenv("CORRECTION_CHUNK_CHARS", "4000"))
+CHUNK_TARGET    = int(os.getenv("CORRECTION_CHUNK_TARGET", "1500"))   # tamaño medio de los trozos
+CHUNK_OVERLAP   = int(os.getenv("CORRECTION_CHUNK_OVERLAP", "300"))   # contexto previo que se envía con cada trozo
+
+PARAGRAPH_RE = re.compile(r"(\n[ \t]*\n\s*)")
+SENTENCE_RE  = re.compile(r"(?<=[.!?…;:])(\s+)")
+SPACE_RE     = re.compile(r"(\s+)")
+
+class Chunk(NamedTuple):
+    prefix:  str    # espacios originales antes del cuerpo
+    body:    str    # texto a corregir (sin espacios en los extremos)
+    suffix:  str    # espacios originales después del cuerpo
+    context: str    # final del trozo anterior, solo como referencia para el modelo
+
+def _pieces(text: str, pattern: re.Pattern, max_chars: int) -> List[str]:
+    # Parte por el patrón conservando los separadores pegados a cada pieza,
+    # de modo que "".join(piezas) == text
+    parts = pattern.split(text)
+    pieces = [parts[i] + (parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+    pieces = [p for p in pieces if p]
+    result = []
+    for piece in pieces:
+        if len(piece) <= max_chars:
+            result.append(piece)
+        elif pattern is PARAGRAPH_RE:
+            result.extend(_pieces(piece, SENTENCE_RE, max_chars))
+        elif pattern is SENTENCE_RE:
+            result.extend(_pieces(piece, SPACE_RE, max_chars))
+        else:
+            # Una "palabra" más larga que un trozo: corte duro
+            result.extend(piece[i:i + max_chars] for i in range(0, len(piece), max_chars))
+    return result
+
+def _context(previous: str, overlap: int) -> str:
+    if overlap <= 0 or not previous:
+        return ""
+    tail = previous[-overlap:]
+    # Empezar en un límite de palabra para no pasar media palabra al modelo
+    cut = tail.find(" ")
+    if 0 <= cut < len(tail) - 1 and len(previous) > overlap:
+        tail = tail[cut + 1:]
+    return tail.strip()
+
+def _is_boundary(piece: str, target: int) -> bool:
+    # Corte definido por el contenido: depende solo de esta pieza (no de lo que
+    # haya antes), con probabilidad proporcional a su longitud -> trozos de
+    # unos `target` caracteres de media
+    body = piece.strip()
+    return bool(body) and zlib.crc32(body.encode()) % target < len(body)
+
+def _content_defined(text: str, max_chars: int, target: int) -> List[str]:
+    # Agrupa párrafos (y, si no caben, frases) en trozos de hasta max_chars. Los
+    # cortes no se deciden llenando desde el principio: editar un párrafo
+    # cambiaría todos los trozos siguientes y su caché. Se corta tras las
+    # piezas elegidas por _is_boundary, así que una edición solo cambia su trozo.
+    raw: List[str] = []
+    current = ""
+    for piece in _pieces(text, PARAGRAPH_RE, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            raw.append(current)
+            current = ""
+        current += piece
+        if _is_boundary(piece, target):
+            raw.append(current)
+            current = ""
+    if current:
+        raw.append(current)
+    return raw
+
+def split_text(text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP,
+               target: int = CHUNK_TARGET) -> List[Chunk]:
+    # Un texto que cabe en un trozo va entero (cada trozo es otra llamada a
+    # Gemini); solo los más largos se parten
+    raw = [text] if len(text) <= max_chars else _content_defined(text, max_chars, target)
+
+    chunks: List[Chunk] = []
+    previous = ""
+    for part in raw:
+        body = part.strip()
+        if not body:
+            # Solo espacios: se pegan al trozo anterior para no perderlos
+            if chunks:
+                last = chunks[-1]
+                chunks[-1] = last._replace(suffix=last.suffix + part)
+            else:
+                chunks.append(Chunk(part, "", "", ""))
+            continue
+        start = part.index(body)
+        chunks.append(Chunk(part[:start], body, part[start + len(body):], _context(previous, overlap)))
+        previous = body
+    return chunks
+
+def stitch(chunks: List[Chunk], corrected: List[str]) -> str:
+    # Reconstrucción determinista: cada cuerpo corregido con sus espacios originales
+    return "".join(c.prefix + text + c.suffix for c, text in zip(chunks, corrected))
@@ -0,0 +1,65 @@
+# backend/document.py
+import asyncio
+import hashlib
+from functools import cached_property
+from io import BytesIO
+from typing import Optional
+
+import magic
+from fastapi import UploadFile
+from PIL import Image
+
+from phash import perceptual_index
+from metrics import stage_timer
+
+# Bytes que necesita libmagic para identificar el tipo
+MIME_SNIFF_BYTES = 2048
+
+class UploadedDocument:
+    # Un documento por petición: los bytes se leen una vez y todo el pipeline
+    # (detección de MIME, hash, OCR, visión) trabaja sobre el mismo buffer.
+    def __init__(self, data: bytes, filename: Optional[str] = None):
+        self.data     = data
+        self.view     = memoryview(data)
+        self.filename = filename
+        self._image: Optional[Image.Image] = None
+        self._image_lock = asyncio.Lock()
+        self._phash: Optional[int] = None
+
+    @classmethod
+    async def from_upload(cls, file: UploadFile) -> "UploadedDocument":
+        return cls(await file.read(), file.filename)
+
+    @cached_property
+    def mime(self) -> str:
+        # libmagic no acepta memoryview: se copian solo los primeros bytes
+        with stage_timer("mime_sniff"):
+            return magic.from_buffer(bytes(self.view[:MIME_SNIFF_BYTES]), mime=True)
+
+    @cached_property
+    def content_hash(self) -> str:
+        # Mismo MD5 que usaba description_cache, sin copiar el buffer
+        return hashlib.md5(self.view).hexdigest()
+
+    def _decode(self) -> Image.Image:
+        with stage_timer("decode"):
+            img = Image.open(BytesIO(self.data))
+            img.load()
+        return img
+
+    async def image(self) -> Image.Image:
+        # Decodificación perezosa, una sola vez y fuera del event loop
+        if self._image is None:
+            async with self._image_lock:
+                if self._image is None:
+                    self._image = await asyncio.to_thread(self._decode)
+        return self._image
+
+    async def perceptual_hash(self) -> int:
+        if self._phash is None:
+            img = await self.image()
+            self._phash = await asyncio.to_thread(perceptual_index.compute, img)
+        return self._phash
+
+    def __len__(self) -> int:
+        return len(self.data)
@@ -0,0 +1,342 @@
+# backend/gemini_gateway.py
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+
+from google.api_core import exceptions as gexc
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+from metrics import observe_stage, record_gemini_usage
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+GEMINI_MODEL           = "gemini-1.5-flash"
+GEMINI_VISION_MODEL    = "gemini-1.5-flash"
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))     # llamadas simultáneas por modelo
+GEMINI_CALL_TIMEOUT    = float(os.getenv("GEMINI_CALL_TIMEOUT", "20"))     # segundos por intento
+GEMINI_DEADLINE        = float(os.getenv("GEMINI_DEADLINE", "45"))         # segundos en total, reintentos incluidos
+GEMINI_MAX_RETRIES     = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+GEMINI_RETRY_RATIO     = float(os.getenv("GEMINI_RETRY_RATIO", "0.2"))     # reintentos por petición
+GEMINI_BREAKER_ERRORS  = int(os.getenv("GEMINI_BREAKER_ERRORS", "5"))
+GEMINI_BREAKER_RESET   = float(os.getenv("GEMINI_BREAKER_RESET", "30"))    # segundos en abierto
+GEMINI_API_ENDPOINT    = os.getenv("GEMINI_API_ENDPOINT")                  # host:puerto gRPC sin TLS (benchmarks/fake_gemini.py)
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP  = 8.0
+
+# Errores transitorios que merece la pena reintentar
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    gexc.ServiceUnavailable,
+    gexc.InternalServerError,
+    gexc.DeadlineExceeded,
+    gexc.Aborted,
+)
+
+class GeminiUnavailable(Exception):
+    """Gemini no está configurado o el circuit breaker no permite la llamada."""
+    pass
+
+# --------------------------------------------------
+# Circuit breaker (sustituye al antiguo contador APIStatus)
+# --------------------------------------------------
+class CircuitBreaker:
+    CLOSED    = "closed"
+    OPEN      = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = GEMINI_BREAKER_ERRORS, reset_timeout: float = GEMINI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout     = reset_timeout
+        self.state             = self.CLOSED
+        self.opened_at         = 0.0
+        self.probe_in_flight   = False
+        self.last_error        = None
+        self.error_count       = 0
+        self.last_success      = datetime.now()
+        self._lock             = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            # Semiabierto: solo una llamada de prueba a la vez
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def report_success(self):
+        with self._lock:
+            self.state           = self.CLOSED
+            self.probe_in_flight = False
+            self.error_count     = 0
+            self.last_success    = datetime.now()
+
+    def report_error(self, error):
+        with self._lock:
+            self.last_error   = error
+            self.error_count += 1
+            if self.state == self.HALF_OPEN or self.error_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker de Gemini abierto tras {self.error_count} errores")
+                self.state     = self.OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        # Llamada cancelada sin resultado: se libera la prueba sin cambiar de estado
+        with self._lock:
+            self.probe_in_flight = False
+
+    def is_likely_quota_exceeded(self):
+        if self.error_count <= 3:
+            return False
+        msg = str(self.last_error).lower() if self.last_error else ""
+        return "quota" in msg or "api_key_invalid" in msg
+
+# --------------------------------------------------
+# Presupuesto de reintentos (token bucket)
+# --------------------------------------------------
+class RetryBudget:
+    # Cada petición deposita `ratio` fichas y cada reintento gasta una, de modo
+    # que los reintentos nunca superan ~ratio * tráfico aunque Gemini caiga.
+    def __init__(self, ratio: float = GEMINI_RETRY_RATIO, max_tokens: float = 10.0):
+        self.ratio      = ratio
+        self.max_tokens = max_tokens
+        self.tokens     = max_tokens
+        self.exhausted  = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+# --------------------------------------------------
+# Gateway asíncrono
+# --------------------------------------------------
+class GeminiGateway:
+    def __init__(self):
+        self.models: Dict[str, Optional["genai.GenerativeModel"]] = {"text": None, "vision": None}
+        self._api_key    = None
+        self._loaded     = False
+        self.breaker     = CircuitBreaker()
+        self.budget      = RetryBudget()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight   = 0
+        self.calls       = 0
+        self.retries     = 0
+        self.timeouts    = 0
+        self._endpoint_client = None
+
+    def configure(self, api_key: Optional[str]):
+        # Solo guarda la clave: la biblioteca (lenta de importar) y los modelos,
+        # con sus canales gRPC, se crean en la primera llamada, ya dentro de
+        # cada worker (gRPC no sobrevive a un fork de gunicorn --preload)
+        self._api_key = api_key
+        self._loaded  = False
+        self.models   = {"text": None, "vision": None}
+        if not api_key:
+            e = ValueError("No se encontró GEMINI_API_KEY en variables de entorno")
+            logger.warning(f"Error configurando Gemini: {e}")
+            self.breaker.report_error(e)
+
+    def _load_models(self):
+        self._loaded = True
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=self._api_key)
+            self.models["text"]   = genai.GenerativeModel(GEMINI_MODEL)
+            self.models["vision"] = genai.GenerativeModel(GEMINI_VISION_MODEL)
+            if GEMINI_API_ENDPOINT:
+                logger.warning(f"Gemini redirigido a {GEMINI_API_ENDPOINT} (solo para pruebas)")
+            logger.info(f"Conexión con Gemini establecida (Modelos: {GEMINI_MODEL})")
+        except Exception as e:
+            logger.warning(f"Error configurando Gemini: {e}")
+            self.models = {"text": None, "vision": None}
+            self.breaker.report_error(e)
+
+    @property
+    def available(self) -> bool:
+        if not self._loaded:
+            return bool(self._api_key)
+        return self.models["text"] is not None
+
+    def _model(self, kind: str) -> Optional["genai.GenerativeModel"]:
+        if not self._loaded and self._api_key:
+            self._load_models()
+        model = self.models.get(kind)
+        if model is not None and GEMINI_API_ENDPOINT and model._async_client is None:
+            # La biblioteca no admite canales sin TLS por configuración (y su
+            # transporte REST no funciona en async): se le da el cliente hecho.
+            # Se crea aquí, dentro del event loop, en la primera llamada.
+            if self._endpoint_client is None:
+                import grpc
+                from google.ai import generativelanguage_v1beta as glm
+                from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+                    GenerativeServiceGrpcAsyncIOTransport,
+                )
+                channel = grpc.aio.insecure_channel(GEMINI_API_ENDPOINT)
+                self._endpoint_client = glm.GenerativeServiceAsyncClient(
+                    transport=GenerativeServiceGrpcAsyncIOTransport(channel=channel)
+                )
+            model._async_client = self._endpoint_client
+        return model
+
+    def _semaphore(self, model_name: str) -> asyncio.Semaphore:
+        # Un semáforo por modelo: texto y visión comparten cupo si usan el mismo
+        if model_name not in self._semaphores:
+            self._semaphores[model_name] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._semaphores[model_name]
+
+    async def generate(self, kind: str, contents):
+        model = self._model(kind)
+        if model is None or not self.breaker.allow_request():
+            raise GeminiUnavailable(f"Gemini ({kind}) no disponible")
+
+        self.calls += 1
+        self.budget.deposit()
+        attempt = 0
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(GEMINI_DEADLINE):
+                async with self._semaphore(model.model_name):
+                    while True:
+                        self.in_flight += 1
+                        try:
+                            resp = await asyncio.wait_for(
+                                model.generate_content_async(contents),
+                                timeout=GEMINI_CALL_TIMEOUT,
+                            )
+                            self.breaker.report_success()
+                            record_gemini_usage(kind, getattr(resp, "usage_metadata", None))
+                            return resp
+                        except RETRYABLE_ERRORS as e:
+                            if isinstance(e, asyncio.TimeoutError):
+                                self.timeouts += 1
+                            if attempt >= GEMINI_MAX_RETRIES or not self.budget.withdraw():
+                                raise
+                            attempt += 1
+                            self.retries += 1
+                            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                            logger.warning(f"Gemini ({kind}) falló ({e!r}), reintento {attempt} en {delay:.2f}s")
+                        finally:
+                            self.in_flight -= 1
+                        await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self.breaker.report_error(e)
+            raise
+        finally:
+            # Incluye reintentos y errores: es lo que espera quien llama
+            observe_stage(f"gemini_{kind}", time.perf_counter() - start)
+
+    async def stream(self, kind: str, contents) -> AsyncIterator[str]:
+        # Como generate, pero entrega el texto a trozos según lo genera el modelo.
+        # Solo se reintenta mientras no se haya emitido nada; después el error se
+        # propaga y quien consume decide qué hacer con lo ya recibido.
+        # GEMINI_CALL_TIMEOUT limita la espera de cada trozo y GEMINI_DEADLINE el
+        # total (no se usa asyncio.timeout porque abarcaría los yield).
+        model = self._model(kind)
+        if model is None or not self.breaker.allow_request():
+            raise GeminiUnavailable(f"Gemini ({kind}) no disponible")
+
+        self.calls += 1
+        self.budget.deposit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GEMINI_DEADLINE
+        attempt = 0
+        start = time.perf_counter()
+        usage = None
+
+        def remaining() -> float:
+            left = deadline - loop.time()
+            if left <= 0:
+                raise asyncio.TimeoutError()
+            return min(left, GEMINI_CALL_TIMEOUT)
+
+        try:
+            async with self._semaphore(model.model_name):
+                while True:
+                    emitted = False
+                    self.in_flight += 1
+                    try:
+                        resp = await asyncio.wait_for(
+                            model.generate_content_async(contents, stream=True),
+                            timeout=remaining(),
+                        )
+                        chunks = resp.__aiter__()
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                            except StopAsyncIteration:
+                                break
+                            try:
+                                text = chunk.text
+                            except ValueError:
+                                # Trozo sin partes de texto (p. ej. solo metadatos)
+                                text = ""
+                            # El recuento de tokens llega con el último trozo
+                            usage = getattr(chunk, "usage_metadata", None) or usage
+                            if text:
+                                emitted = True
+                                yield text
+                        self.breaker.report_success()
+                        record_gemini_usage(kind, usage)
+                        return
+                    except RETRYABLE_ERRORS as e:
+                        if isinstance(e, asyncio.TimeoutError):
+                            self.timeouts += 1
+                        if emitted or attempt >= GEMINI_MAX_RETRIES or not self.budget.withdraw():
+                            raise
+                        attempt += 1
+                        self.retries += 1
+                        delay = min(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)), deadline - loop.time())
+                        logger.warning(f"Gemini ({kind}, stream) falló ({e!r}), reintento {attempt} en {delay:.2f}s")
+                    finally:
+                        self.in_flight -= 1
+                    await asyncio.sleep(max(0.0, delay))
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cliente desconectado a mitad de respuesta: no cuenta como fallo
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self.breaker.report_error(e)
+            raise
+        finally:
+            observe_stage(f"gemini_{kind}", time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "circuit_state":      self.breaker.state,
+            "in_flight":          self.in_flight,
+            "calls":              self.calls,
+            "retries":            self.retries,
+            "timeouts":           self.timeouts,
+            "retry_budget":       round(self.budget.tokens, 2),
+            "budget_exhausted":   self.budget.exhausted,
+        }
+
+gemini = GeminiGateway()
@@ -0,0 +1,45 @@
+# backend/gunicorn_conf.py
+#
+# Perfil de producción: gunicorn -c gunicorn_conf.py main:app
+#
+# Un worker Uvicorn por núcleo. Con preload_app la aplicación se importa una
+# sola vez en el proceso maestro y los workers la heredan al hacer fork
+# (arranque más rápido y menos memoria). Lo que no sobrevive a un fork
+# (pools de procesos OCR y de conexiones, canales gRPC de Gemini, conexiones
+# SQLite) se crea de forma perezosa dentro de cada worker.
+import gc
+import os
+import multiprocessing
+
+cpus = multiprocessing.cpu_count()
+
+bind         = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers      = int(os.getenv("WEB_CONCURRENCY", str(cpus)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app  = True
+
+# Un OCR lento no debe hacer que gunicorn mate al worker (el event loop sigue
+# respondiendo); al apagar, margen para vaciar peticiones y trabajos en curso
+timeout          = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+keepalive        = int(os.getenv("KEEPALIVE", "5"))
+
+# Proxies cuyo X-Forwarded-For se acepta como IP del cliente (límite de login
+# por IP); "*" solo si el backend no es accesible más que a través del proxy
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = "-"
+errorlog  = "-"
+loglevel  = os.getenv("LOG_LEVEL", "info")
+
+# Cada worker tiene su propio pool de Tesseract: se reparten los núcleos para
+# no lanzar workers * núcleos procesos OCR. Se fija antes de importar la app.
+os.environ.setdefault("OCR_WORKERS", str(max(1, cpus // workers)))
+# Los trabajos en curso deben poder terminar antes de que gunicorn mate al worker
+os.environ.setdefault("JOBS_DRAIN_TIMEOUT", str(max(1, graceful_timeout - 10)))
+
+def when_ready(server):
+    # Los objetos importados en el maestro pasan a la generación permanente: el
+    # GC de los workers no los recorre y sus páginas siguen compartidas
+    gc.freeze()
+    server.log.info(f"{workers} workers Uvicorn (preload), OCR_WORKERS={os.environ['OCR_WORKERS']} por worker")
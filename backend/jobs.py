@@ -0,0 +1,301 @@
+# backend/jobs.py
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+JOBS_DB_PATH      = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+JOBS_WORKERS      = int(os.getenv("JOBS_WORKERS", "2"))          # trabajos simultáneos por proceso
+JOBS_MAX_QUEUED   = int(os.getenv("JOBS_MAX_QUEUED", "1000"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETRY_DELAY  = float(os.getenv("JOBS_RETRY_DELAY", "10"))    # segundos antes del 2º intento; se dobla en cada fallo
+JOBS_RETRY_MAX_DELAY = float(os.getenv("JOBS_RETRY_MAX_DELAY", "600"))
+JOBS_LEASE        = float(os.getenv("JOBS_LEASE", "300"))         # segundos antes de dar por muerto a un worker
+JOBS_RETENTION    = float(os.getenv("JOBS_RETENTION", "86400"))   # segundos que se guardan los terminados
+JOBS_DRAIN_TIMEOUT = float(os.getenv("JOBS_DRAIN_TIMEOUT", "30")) # segundos para terminar los trabajos en curso al apagar
+JOBS_POLL         = 1.0
+
+QUEUED  = "queued"
+RUNNING = "running"
+DONE    = "done"
+FAILED  = "failed"
+
+class JobQueueFull(Exception):
+    pass
+
+class RetryLater(Exception):
+    """El handler no pudo empezar (p. ej. OCR saturado): se reintenta tras `delay` sin gastar un intento."""
+    def __init__(self, message: str, delay: float):
+        super().__init__(message)
+        self.delay = delay
+
+class PermanentJobError(Exception):
+    """Error que se repetiría en cada intento (p. ej. imagen corrupta): el trabajo falla sin reintentos."""
+    pass
+
+# --------------------------------------------------
+# Cola persistente en SQLite (compartida entre workers, sobrevive a reinicios)
+# --------------------------------------------------
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path   = path
+        self._local = threading.local()
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id         TEXT PRIMARY KEY,
+                kind       TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                payload    BLOB,
+                result     TEXT,
+                error      TEXT,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                locked_by  TEXT,
+                locked_at  REAL,
+                not_before REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn().execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        # Colas creadas antes de los reintentos con espera
+        columns = {row["name"] for row in self._conn().execute("PRAGMA table_info(jobs)")}
+        if "not_before" not in columns:
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión heredada de otro proceso (fork de gunicorn --preload) no se reutiliza
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid  = os.getpid()
+        return conn
+
+    def submit(self, kind: str, payload: bytes) -> str:
+        conn = self._conn()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        if queued >= JOBS_MAX_QUEUED:
+            raise JobQueueFull(f"Cola de trabajos llena ({queued}/{JOBS_MAX_QUEUED})")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, payload, now, now)
+        )
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, bytes]]:
+        conn = self._conn()
+        now = time.time()
+        # BEGIN IMMEDIATE: dos workers nunca reclaman el mismo trabajo
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? AND not_before <= ? ORDER BY created_at LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_by = ?, locked_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            return row["id"], row["kind"], row["payload"]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def complete(self, job_id: str, result: Dict):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, payload = NULL, locked_by = NULL, updated_at = ? WHERE id = ?",
+            (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str, retry: bool = True):
+        # Se reintenta hasta JOBS_MAX_ATTEMPTS con espera exponencial (10 s, 20 s, ...);
+        # después, o si el error no es reintentable, queda como fallido
+        now = time.time()
+        self._conn().execute("""
+            UPDATE jobs SET
+                status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END,
+                payload = CASE WHEN ? AND attempts < ? THEN payload ELSE NULL END,
+                not_before = ? + MIN(?, ? * (1 << (attempts - 1))),
+                error = ?, locked_by = NULL, updated_at = ?
+            WHERE id = ?
+        """, (retry, JOBS_MAX_ATTEMPTS, QUEUED, FAILED, retry, JOBS_MAX_ATTEMPTS,
+              now, JOBS_RETRY_MAX_DELAY, JOBS_RETRY_DELAY, error, now, job_id))
+
+    def defer(self, job_id: str, delay: float):
+        # El trabajo no llegó a ejecutarse: vuelve a la cola tras `delay` sin contar como intento
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, attempts = attempts - 1, locked_by = NULL, not_before = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (QUEUED, now + delay, now, job_id, RUNNING)
+        )
+
+    def release(self, job_id: str):
+        # Apagado ordenado: el trabajo vuelve a la cola sin contar como intento
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, attempts = attempts - 1, locked_by = NULL, updated_at = ? WHERE id = ? AND status = ?",
+            (QUEUED, time.time(), job_id, RUNNING)
+        )
+
+    def renew(self, job_id: str, worker_id: str):
+        # El worker sigue vivo: amplía el lease para que recover no lo dé por muerto
+        self._conn().execute(
+            "UPDATE jobs SET locked_at = ? WHERE id = ? AND locked_by = ? AND status = ?",
+            (time.time(), job_id, worker_id, RUNNING)
+        )
+
+    def recover(self) -> int:
+        # Trabajos de workers que murieron sin terminarlos (lease caducado)
+        # vuelven a la cola, salvo que ya hayan gastado sus intentos: un
+        # trabajo que tumba al worker no se reintenta indefinidamente
+        now = time.time()
+        conn = self._conn()
+        cur = conn.execute("""
+            UPDATE jobs SET
+                status = CASE WHEN attempts < ? THEN ? ELSE ? END,
+                payload = CASE WHEN attempts < ? THEN payload ELSE NULL END,
+                error = CASE WHEN attempts < ? THEN error ELSE ? END,
+                locked_by = NULL, updated_at = ?
+            WHERE status = ? AND locked_at < ?
+        """, (JOBS_MAX_ATTEMPTS, QUEUED, FAILED, JOBS_MAX_ATTEMPTS, JOBS_MAX_ATTEMPTS,
+              "El worker que lo procesaba dejó de responder", now, RUNNING, now - JOBS_LEASE))
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, now - JOBS_RETENTION)
+        )
+        return cur.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT id, kind, status, result, error, attempts, not_before, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+# --------------------------------------------------
+# Workers locales que vacían la cola
+# --------------------------------------------------
+class JobWorkerPool:
+    def __init__(self, queue: JobQueue, workers: int = JOBS_WORKERS):
+        self.queue     = queue
+        self.workers   = workers
+        self.handlers: Dict[str, Callable[[bytes], Awaitable[Dict]]] = {}
+        self._tasks    = []
+        self._wakeup   = None
+        self.running   = 0
+        self.stopping  = False
+
+    def register(self, kind: str, handler: Callable[[bytes], Awaitable[Dict]]):
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, payload: bytes) -> str:
+        job_id = await asyncio.to_thread(self.queue.submit, kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def start(self):
+        # El pid se lee aquí: con gunicorn --preload el módulo se importa en el proceso maestro
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(f"{prefix}-{i}")) for i in range(self.workers)]
+        logger.info(f"Workers de trabajos iniciados ({self.workers})")
+
+    async def stop(self, timeout: float = JOBS_DRAIN_TIMEOUT):
+        # Apagado ordenado: no se reclaman trabajos nuevos y los que están en
+        # curso tienen `timeout` segundos para terminar; los demás se cancelan
+        # y vuelven a la cola sin contar como intento
+        self.stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._tasks:
+            if self.running:
+                logger.info(f"Esperando a {self.running} trabajos en curso (máx. {timeout:.0f}s)")
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str):
+        last_recover = None
+        while not self.stopping:
+            if last_recover is None or time.monotonic() - last_recover > JOBS_LEASE / 2:
+                last_recover = time.monotonic()
+                recovered = await asyncio.to_thread(self.queue.recover)
+                if recovered:
+                    logger.warning(f"{recovered} trabajos recuperados de workers caídos")
+
+            try:
+                job = await asyncio.to_thread(self.queue.claim, worker_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Error reclamando trabajo: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOBS_POLL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, kind, payload = job
+            self.running += 1
+            heartbeat = asyncio.create_task(self._renew(job_id, worker_id))
+            try:
+                handler = self.handlers[kind]
+                result = await handler(payload)
+            except asyncio.CancelledError:
+                await asyncio.shield(asyncio.to_thread(self.queue.release, job_id))
+                raise
+            except RetryLater as e:
+                logger.warning(f"Trabajo {job_id} ({kind}) aplazado {e.delay:.0f}s: {e}")
+                await asyncio.to_thread(self.queue.defer, job_id, e.delay)
+                continue
+            except Exception as e:
+                logger.error(f"Trabajo {job_id} ({kind}) falló: {e}")
+                await asyncio.to_thread(self.queue.fail, job_id, str(e), not isinstance(e, PermanentJobError))
+                continue
+            finally:
+                heartbeat.cancel()
+                self.running -= 1
+            await asyncio.to_thread(self.queue.complete, job_id, result)
+
+    async def _renew(self, job_id: str, worker_id: str):
+        # Un trabajo más largo que JOBS_LEASE no debe ejecutarse dos veces
+        while True:
+            await asyncio.sleep(JOBS_LEASE / 3)
+            try:
+                await asyncio.to_thread(self.queue.renew, job_id, worker_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Error renovando el lease del trabajo {job_id}: {e}")
+
+job_queue   = JobQueue()
+job_workers = JobWorkerPool(job_queue)
@@ -0,0 +1,366 @@
+# backend/local_correction.py
+import os
+import re
+import gzip
+import heapq
+import json
+import time
+import logging
+import threading
+from importlib import resources
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+LOCAL_SPELL_LANGUAGES    = [l.strip() for l in os.getenv("LOCAL_SPELL_LANGUAGES", "es,en").split(",") if l.strip()]
+LOCAL_SPELL_MAX_WORDS    = int(os.getenv("LOCAL_SPELL_MAX_WORDS", "40000"))   # sugerencias: palabras más frecuentes por idioma
+LOCAL_SPELL_MAX_DISTANCE = int(os.getenv("LOCAL_SPELL_MAX_DISTANCE", "1"))    # 2 multiplica la memoria del índice
+LOCAL_SPELL_MIN_LENGTH   = int(os.getenv("LOCAL_SPELL_MIN_LENGTH", "4"))      # palabras más cortas no se tocan
+# Frecuencia mínima (escala Zipf de wordfreq) para dar una palabra por buena: la
+# lista grande incluye erratas comunes (wiil, tomorow ~1.7) junto a formas
+# raras pero correctas (vendré ~2.7)
+LOCAL_SPELL_MIN_ZIPF     = float(os.getenv("LOCAL_SPELL_MIN_ZIPF", "2.0"))
+
+# Diccionarios de frecuencias de formas completas (tiene, puede, está, ...)
+# del paquete wordfreq. La corrección por distancia de edición solo es segura
+# con formas completas: con una lista de lemas, una forma correcta pero ausente
+# acaba sustituida por otra palabra real a una letra (tiene -> tine).
+try:
+    import wordfreq
+except ImportError:
+    wordfreq = None
+
+# Sin wordfreq, las listas de pyspellchecker (versión fijada en
+# requirements.txt: se lee su directorio resources/). La de español solo trae
+# lemas, así que con ellas solo se aplican las confusiones OCR.
+try:
+    DICTIONARY_PACKAGE = resources.files("spellchecker") / "resources"
+except ModuleNotFoundError:
+    DICTIONARY_PACKAGE = None
+
+WORD_RE       = re.compile(r"[\w|]+")
+HYPHENATED_RE = re.compile(r"(\w+)-[ \t]*\n[ \t]*(\w+)")
+SPACES_RE     = re.compile(r"[ \t]{2,}")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+SPACE_BEFORE_PUNCT_RE = re.compile(r"[ \t]+([,.;:!?)\]])")
+SENTENCE_BREAKS = ".!?¡¿\n"
+
+# Flexiones habituales en español e inglés: sufijo -> terminaciones de la forma base
+VERB_BASES = ("ar", "er", "ir")
+INFLECTIONS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("es", ("",)), ("s", ("",)), ("mente", ("",)),
+    *((suffix, VERB_BASES) for suffix in (
+        "a", "e", "o", "as", "an", "en", "amos", "emos", "imos", "ó", "é", "ía", "ían", "aba", "aban",
+        "ado", "ada", "ados", "adas", "ido", "ida", "idos", "idas", "ando", "iendo", "ará", "erá", "irá",
+    )),
+    ("ed", ("", "e")), ("ing", ("", "e")), ("ies", ("y",)), ("ly", ("",)),
+)
+
+# Confusiones típicas de Tesseract: secuencia leída -> secuencias posibles
+OCR_CONFUSIONS: Dict[str, Tuple[str, ...]] = {
+    "rn": ("m",),
+    "m":  ("rn",),
+    "cl": ("d",),
+    "vv": ("w",),
+    "ii": ("u", "ü"),
+    "li": ("h",),
+    "0":  ("o",),
+    "1":  ("l", "i"),
+    "|":  ("l", "i"),
+    "5":  ("s",),
+    "8":  ("b",),
+    "6":  ("b",),
+    "2":  ("z",),
+    "€":  ("e",),
+}
+CONFUSION_RE = re.compile("|".join(sorted(map(re.escape, OCR_CONFUSIONS), key=len, reverse=True)))
+
+class LocalCorrection(NamedTuple):
+    text:      str
+    words:     int    # palabras revisadas
+    unknown:   int    # palabras fuera del diccionario (corregidas o no)
+    corrected: int    # palabras cambiadas
+
+    @property
+    def unresolved_ratio(self) -> float:
+        # Fracción de palabras que siguen sin estar en el diccionario tras corregir
+        return (self.unknown - self.corrected) / self.words if self.words else 0.0
+
+def _deletes(word: str, max_distance: int) -> set:
+    # Todas las variantes de word con hasta max_distance letras borradas
+    result = set()
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for w in frontier:
+            for i in range(len(w)):
+                variant = w[:i] + w[i + 1:]
+                if variant not in result:
+                    result.add(variant)
+                    next_frontier.add(variant)
+        frontier = next_frontier
+    return result
+
+def _distance(a: str, b: str, max_distance: int) -> int:
+    # Damerau-Levenshtein (transposiciones adyacentes) con corte en max_distance
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def _match_case(word: str, template: str) -> str:
+    if template.isupper() and len(template) > 1:
+        return word.upper()
+    if template[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+class LocalCorrector:
+    # Corrector ortográfico al estilo SymSpell: para cada palabra del diccionario
+    # se indexan sus variantes con hasta N letras borradas. Una palabra
+    # desconocida solo se compara con las palabras que comparten alguna de sus
+    # propias variantes, así que cada consulta son unos pocos accesos a un dict
+    # en lugar de recorrer el diccionario. Antes se prueban las confusiones
+    # típicas de Tesseract (c0mo -> como, inforrn -> inform).
+    def __init__(self, languages: List[str] = LOCAL_SPELL_LANGUAGES, max_words: int = LOCAL_SPELL_MAX_WORDS,
+                 max_distance: int = LOCAL_SPELL_MAX_DISTANCE):
+        self.languages    = languages
+        self.max_words    = max_words
+        self.max_distance = max_distance
+        self.frequencies: Dict[str, float] = {}
+        self.vocabulary: Set[str] = set()
+        self.deletes: Dict[str, object] = {}
+        self.source   = None
+        self._loaded  = False
+        self._loading = False
+        self._lock    = threading.Lock()
+        self.calls   = 0
+        self.total_time = 0.0
+
+    # ---------- carga del diccionario ----------
+    def _load_language(self, language: str) -> Tuple[Dict[str, float], Set[str], bool]:
+        # Palabras más frecuentes del idioma (candidatas a sugerencia), todas
+        # las palabras conocidas (una forma rara pero correcta no se corrige) y
+        # si son formas completas
+        if wordfreq is not None:
+            min_freq = 10 ** (LOCAL_SPELL_MIN_ZIPF - 9)
+            words = {
+                w: freq for w, freq in wordfreq.get_frequency_dict(language, wordlist="large").items()
+                if freq >= min_freq
+            }
+            # get_frequency_dict guarda la lista entera en su lru_cache: no hace falta después
+            wordfreq.get_frequency_dict.cache_clear()
+            wordfreq.get_frequency_list.cache_clear()
+            full_forms = True
+        else:
+            path = DICTIONARY_PACKAGE / f"{language}.json.gz"
+            with path.open("rb") as f:
+                words = json.loads(gzip.decompress(f.read()))
+            full_forms = False
+        vocabulary = {w for w in words if w.isalpha()}
+        top = heapq.nlargest(self.max_words, ((w, words[w]) for w in vocabulary), key=lambda item: item[1])
+        return dict(top), vocabulary, full_forms
+
+    def start_loading(self):
+        # La carga tarda unos segundos: se hace en segundo plano y, mientras
+        # tanto, correct() solo aplica las reglas que no necesitan diccionario
+        with self._lock:
+            if self._loading or self._loaded:
+                return
+            self._loading = True
+        threading.Thread(target=self.load, name="local-corrector-load", daemon=True).start()
+
+    def load(self):
+        start = time.perf_counter()
+        frequencies: Dict[str, float] = {}
+        vocabulary: Set[str] = set()
+        deletes: Dict[str, object] = {}
+        full_forms = True
+        if wordfreq is None and DICTIONARY_PACKAGE is None:
+            logger.warning("Ni wordfreq ni pyspellchecker están instalados: el corrector local solo aplicará reglas")
+        else:
+            for language in self.languages:
+                try:
+                    words, known, complete = self._load_language(language)
+                except (OSError, ValueError, LookupError) as e:
+                    logger.warning(f"No se pudo cargar el diccionario '{language}': {e}")
+                    continue
+                full_forms = full_forms and complete
+                vocabulary |= known
+                # Frecuencias relativas: los corpus de cada idioma tienen tamaños distintos
+                total = sum(words.values()) or 1
+                for word, freq in words.items():
+                    frequencies[word] = max(frequencies.get(word, 0.0), freq / total)
+            if full_forms:
+                for word in frequencies:
+                    self._index(deletes, word)
+            else:
+                logger.warning("Diccionarios de lemas (sin wordfreq): no se corregirá por distancia de edición")
+        # Se publican ya completos: las consultas concurrentes nunca ven un índice a medias
+        self.frequencies, self.vocabulary, self.deletes = frequencies, vocabulary, deletes
+        self.source  = "wordfreq" if wordfreq is not None else "pyspellchecker" if frequencies else None
+        self._loaded = True
+        logger.info(
+            f"Corrector local listo: {len(vocabulary)} palabras ({len(frequencies)} sugeribles), {len(deletes)} variantes "
+            f"en {time.perf_counter() - start:.1f}s"
+        )
+
+    def _index(self, deletes: Dict[str, object], word: str):
+        # Un solo str cuando la variante es única (la mayoría): ahorra una lista por entrada
+        for variant in _deletes(word, self.max_distance) | {word}:
+            current = deletes.get(variant)
+            if current is None:
+                deletes[variant] = word
+            elif isinstance(current, str):
+                if current != word:
+                    deletes[variant] = [current, word]
+            else:
+                current.append(word)
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded
+
+    # ---------- búsqueda ----------
+    def known(self, word: str) -> bool:
+        return word in self.vocabulary
+
+    def plausible(self, word: str) -> bool:
+        # El diccionario no trae todas las formas (plurales, tiempos verbales):
+        # una palabra cuya raíz es conocida se da por buena y no se corrige
+        for suffix, bases in INFLECTIONS:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                stem = word[:-len(suffix)]
+                if any(stem + base in self.vocabulary for base in bases):
+                    return True
+        return False
+
+    def suggest(self, word: str) -> Optional[str]:
+        # La palabra más frecuente a la menor distancia, o None
+        best: Optional[Tuple[int, float, str]] = None
+        seen = set()
+        for variant in _deletes(word, self.max_distance) | {word}:
+            candidates = self.deletes.get(variant)
+            if candidates is None:
+                continue
+            for candidate in ((candidates,) if isinstance(candidates, str) else candidates):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = _distance(word, candidate, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                key = (distance, -self.frequencies[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return best[2] if best else None
+
+    def _confusion_candidates(self, word: str) -> List[str]:
+        # Variantes aplicando una confusión OCR en cada posición (y todas a la vez)
+        candidates = []
+        for match in CONFUSION_RE.finditer(word):
+            for replacement in OCR_CONFUSIONS[match.group()]:
+                candidates.append(word[:match.start()] + replacement + word[match.end():])
+        everything = CONFUSION_RE.sub(lambda m: OCR_CONFUSIONS[m.group()][0], word)
+        if everything != word:
+            candidates.append(everything)
+        return candidates
+
+    def correct_word(self, token: str, sentence_start: bool = False) -> Optional[str]:
+        # Devuelve la corrección de token o None si se deja como está
+        word = token.lower()
+        if self.known(word) or self.plausible(word):
+            return None
+        return self._fix(token, word, sentence_start)
+
+    def _fix(self, token: str, word: str, sentence_start: bool) -> Optional[str]:
+        letters = sum(c.isalpha() for c in word)
+        if letters == 0 or letters < len(word) / 2:
+            # Números, códigos, referencias...: no son palabras
+            return None
+
+        # 1) Confusiones OCR que dan una palabra conocida (la más frecuente)
+        confused = [c for c in self._confusion_candidates(word) if self.known(c)]
+        if confused:
+            return _match_case(max(confused, key=lambda c: self.frequencies.get(c, 0.0)), token)
+
+        # 2) Distancia de edición (solo con índice, es decir, con formas
+        #    completas). Los nombres propios (mayúscula en mitad de frase) y
+        #    las palabras cortas no se tocan.
+        if not self.deletes or not word.isalpha() or len(word) < LOCAL_SPELL_MIN_LENGTH:
+            return None
+        if token[:1].isupper() and not sentence_start:
+            return None
+        suggestion = self.suggest(word)
+        return _match_case(suggestion, token) if suggestion else None
+
+    def correct(self, text: str) -> LocalCorrection:
+        if not self._loaded:
+            self.start_loading()
+        start = time.perf_counter()
+        words = unknown = corrected = 0
+
+        # Palabras partidas con guion a final de línea
+        def join_hyphenated(m: re.Match) -> str:
+            joined = m.group(1) + m.group(2)
+            return joined if self.known(joined.lower()) else m.group(0)
+        text = HYPHENATED_RE.sub(join_hyphenated, text)
+
+        out: List[str] = []
+        last = 0
+        for m in WORD_RE.finditer(text):
+            token = m.group()
+            before = text[last:m.start()]
+            sentence_start = last == 0 or any(c in SENTENCE_BREAKS for c in before)
+            out.append(before)
+            last = m.end()
+            words += 1
+            lower = token.lower()
+            if self.known(lower) or self.plausible(lower):
+                out.append(token)
+                continue
+            unknown += 1
+            fixed = self._fix(token, lower, sentence_start)
+            if fixed is not None and fixed != token:
+                corrected += 1
+                out.append(fixed)
+            else:
+                out.append(token)
+        out.append(text[last:])
+
+        result = "".join(out)
+        result = SPACES_RE.sub(" ", result)
+        result = SPACE_BEFORE_PUNCT_RE.sub(r"\1", result)
+        result = BLANK_LINES_RE.sub("\n\n", result)
+
+        self.calls += 1
+        self.total_time += time.perf_counter() - start
+        return LocalCorrection(result, words, unknown, corrected)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "loaded":       self._loaded,
+            "languages":    self.languages,
+            "source":       self.source,
+            "words":        len(self.vocabulary),
+            "suggestable":  len(self.frequencies),
+            "variants":     len(self.deletes),
+            "calls":        self.calls,
+            "avg_time_ms":  round(self.total_time / (self.calls or 1) * 1000, 3),
+        }
+
+local_corrector = LocalCorrector()
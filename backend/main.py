@@ -1,25 +1,41 @@
 # main.py
 
+import io
 import os
+import csv
+import json
+import asyncio
 import logging
 import hashlib
-from datetime import datetime, timedelta
-from io import BytesIO
+from datetime import timedelta
 from typing import Dict, Optional, Tuple, List
 
-from fastapi import FastAPI, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
-import magic
-import pytesseract
-import google.generativeai as genai
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from psycopg2 import sql
+from PIL import Image, UnidentifiedImageError
 
 # Importaciones para usuarios / ajustes (YA SIN SQLAlchemy)
-from database import get_db
+from database import get_db, db_connection, db_pool
+from passwords import password_hasher
 import schemas
-from auth import router as auth_router, get_current_user
+from auth import router as auth_router, get_current_user, invalidate_user
+from ocr_engine import ocr_engine, OCRQueueFull
+from cache import make_cache, make_shared_cache
+from gemini_gateway import gemini, GeminiUnavailable, GEMINI_VISION_MODEL
+from singleflight import SingleFlight
+from pages import count_pages, iter_pages, UnsupportedDocument
+from document import UploadedDocument
+from phash import perceptual_index
+from results import result_store
+from chunking import Chunk, split_text, stitch
+from preprocess import prepare_for_vision
+from local_correction import local_corrector
+from metrics import registry as metrics_registry, MetricsMiddleware
+from jobs import job_queue, job_workers, JobQueueFull, RetryLater, PermanentJobError, QUEUED, DONE, FAILED
 
 # --------------------------------------------------
 # Cargar configuración desde .env
@@ -50,44 +66,9 @@ class ImageDescriptionRequest(BaseModel):
 # --------------------------------------------------
 # Configuración de Gemini (texto + visión multimodal)
 # --------------------------------------------------
-GEMINI_API_KEY       = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL         = "gemini-1.5-flash"
-GEMINI_VISION_MODEL  = "gemini-1.5-flash"
-
-class APIStatus:
-    def __init__(self):
-        self.last_error   = None
-        self.error_count  = 0
-        self.last_success = datetime.now()
-
-    def report_error(self, error):
-        self.last_error  = error
-        self.error_count += 1
-
-    def report_success(self):
-        self.last_success = datetime.now()
-        self.error_count  = 0
-
-    def is_likely_quota_exceeded(self):
-        if self.error_count <= 3:
-            return False
-        msg = str(self.last_error).lower() if self.last_error else ""
-        return "quota" in msg or "api_key_invalid" in msg
-
-api_status = APIStatus()
-
-try:
-    if not GEMINI_API_KEY:
-        raise ValueError("No se encontró GEMINI_API_KEY en variables de entorno")
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model        = genai.GenerativeModel(GEMINI_MODEL)
-    gemini_vision_model = genai.GenerativeModel(GEMINI_VISION_MODEL)
-    logger.info(f"Conexión con Gemini establecida (Modelos: {GEMINI_MODEL})")
-except Exception as e:
-    logger.warning(f"Error configurando Gemini: {e}")
-    gemini_model = None
-    gemini_vision_model = None
-    api_status.report_error(e)
+# Los modelos se crean en la primera llamada (ver GeminiGateway.configure)
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+api_status = gemini.breaker
 
 # --------------------------------------------------
 # CORS
@@ -97,145 +78,355 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cabeceras que el frontend necesita leer (paginación de /admin/users)
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Contadores y latencia por endpoint (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # --------------------------------------------------
-# Caché con TTL
+# Caché con TTL (L1 en memoria + L2 persistente compartida)
 # --------------------------------------------------
-class TimedCache:
-    def __init__(self, maxsize=100, ttl=timedelta(hours=1)):
-        self.cache   = {}
-        self.maxsize = maxsize
-        self.ttl     = ttl
-
-    def get(self, key):
-        if key not in self.cache:
-            return None
-        value, ts = self.cache[key]
-        if datetime.now() - ts > self.ttl:
-            del self.cache[key]
-            return None
-        return value
-
-    def set(self, key, value):
-        if len(self.cache) >= self.maxsize:
-            oldest = next(iter(self.cache))
-            del self.cache[oldest]
-        self.cache[key] = (value, datetime.now())
-
-correction_cache  = TimedCache(maxsize=200, ttl=timedelta(hours=6))
-description_cache = TimedCache(maxsize=100, ttl=timedelta(hours=24))
+correction_cache  = make_cache("correction", maxsize=200, ttl=timedelta(hours=6), maxbytes=16 * 1024 * 1024)
+description_cache = make_cache("description", maxsize=100, ttl=timedelta(hours=24), maxbytes=8 * 1024 * 1024)
 
 def get_cache_key(text: str) -> str:
     return hashlib.md5(text.encode()).hexdigest()
 
-def apply_basic_corrections(text: str) -> str:
-    corrections = {
-        "  ": " ",
-        "\n\n\n": "\n\n",
-    }
-    for wrong, right in corrections.items():
-        text = text.replace(wrong, right)
-    return text
-
 # --------------------------------------------------
 # Corrección y descripción
 # --------------------------------------------------
-async def correct_with_gemini(text: str) -> Tuple[str, bool]:
-    key = get_cache_key(text)
-    cached = correction_cache.get(key)
+# Llamadas idénticas simultáneas (misma clave de caché) comparten una única petición a Gemini
+correction_flight  = SingleFlight("correction")
+description_flight = SingleFlight("description")
+
+# Trozos de un mismo texto largo que se corrigen a la vez
+CORRECTION_CHUNK_CONCURRENCY = int(os.getenv("CORRECTION_CHUNK_CONCURRENCY", "4"))
+
+# Enrutado al corrector local: si tras corregir localmente un trozo queda como
+# mucho esta fracción de palabras desconocidas, no se llama a Gemini (-1 = nunca)
+LOCAL_CORRECTION_ROUTE_RATIO = float(os.getenv("LOCAL_CORRECTION_ROUTE_RATIO", "-1"))
+
+def _route_locally(text: str) -> Optional[str]:
+    # Texto ya limpio según el corrector local: se evita la llamada a Gemini
+    if LOCAL_CORRECTION_ROUTE_RATIO < 0 or not local_corrector.ready:
+        return None
+    local = local_corrector.correct(text)
+    return local.text if local.unresolved_ratio <= LOCAL_CORRECTION_ROUTE_RATIO else None
+
+def _correction_prompt(text: str, context: str = "") -> str:
+    prompt = (
+        "Primero, decide si este texto es legible. "
+        "Si no es legible (ruido o caracteres sin sentido), "
+        "responde EXACTAMENTE \"True\" (sin comillas). "
+        "En caso contrario, corrige ortografía y gramática "
+        "manteniendo la estructura, términos técnicos e idioma. "
+        "Devuelve SOLO el texto corregido o la palabra True.\n\n"
+    )
+    if context:
+        prompt += (
+            "Este fragmento es solo el final del texto anterior, como contexto; "
+            "NO lo corrijas ni lo incluyas en la respuesta:\n"
+            f"<<<{context}>>>\n\n"
+            "Texto a corregir:\n"
+        )
+    return prompt + text
+
+async def _gemini_correct(text: str, key: str, context: str = "") -> str:
+    resp = await gemini.generate("text", _correction_prompt(text, context))
+    result = resp.text.strip() if resp.text else ""
+
+    corrected = "True" if result.lower() == "true" else result
+    await correction_cache.aset(key, corrected)
+    return corrected
+
+async def _vision_contents(doc: UploadedDocument) -> list:
+    # Se envía una versión reducida y recomprimida de la imagen, no el original
+    src = await doc.image()
+    vision_bytes, mime_type = await asyncio.to_thread(prepare_for_vision, doc.data, src)
+    prompt = "SOLO responde con la descripción de esta imagen en detalle, incluyendo texto relevante y contexto. Sé preciso y conciso."
+    return [prompt, {"mime_type": mime_type, "data": vision_bytes}]
+
+async def _remember_description(doc: UploadedDocument, desc: str):
+    await description_cache.aset(doc.content_hash, desc)
+    await asyncio.to_thread(perceptual_index.add, await doc.perceptual_hash(), doc.content_hash)
+
+async def _gemini_describe(doc: UploadedDocument) -> str:
+    resp = await gemini.generate("vision", await _vision_contents(doc))
+    desc = resp.text or "No se pudo generar descripción"
+    await _remember_description(doc, desc)
+    return desc
+
+async def _near_duplicate_description(doc: UploadedDocument) -> Optional[str]:
+    # La misma página fotografiada otra vez o recomprimida tiene otro MD5 pero
+    # casi el mismo hash perceptual: se reutiliza su descripción
+    try:
+        matches = await asyncio.to_thread(perceptual_index.lookup, await doc.perceptual_hash())
+    except Exception as e:
+        logger.warning(f"No se pudo calcular el hash perceptual: {e}")
+        return None
+    # La más cercana puede haber caducado ya de la caché: se prueba con las siguientes
+    for distance, content_hash in matches:
+        desc = await description_cache.aget(content_hash)
+        if desc:
+            logger.info(f"Descripción reutilizada de una imagen casi idéntica (distancia {distance})")
+            await description_cache.aset(doc.content_hash, desc)
+            return desc
+        await asyncio.to_thread(perceptual_index.remove, content_hash)
+    return None
+
+async def _correct_chunk(chunk: Chunk, sem: asyncio.Semaphore) -> Tuple[str, bool]:
+    if not chunk.body:
+        return "", True
+    # Caché por trozo (solo el cuerpo, no el contexto): al editar un párrafo
+    # solo se vuelve a corregir su trozo
+    key = get_cache_key(chunk.body)
+    cached = await correction_cache.aget(key)
     if cached:
         return cached, True
-
-    if not gemini_model or api_status.is_likely_quota_exceeded():
-        return apply_basic_corrections(text), False
+    local = _route_locally(chunk.body)
+    if local is not None:
+        return local, False
 
     try:
-        prompt = (
-            "Primero, decide si este texto es legible. "
-            "Si no es legible (ruido o caracteres sin sentido), "
-            "responde EXACTAMENTE \"True\" (sin comillas). "
-            "En caso contrario, corrige ortografía y gramática "
-            "manteniendo la estructura, términos técnicos e idioma. "
-            "Devuelve SOLO el texto corregido o la palabra True.\n\n"
-            f"{text[:15000]}"
-        )
-        resp = gemini_model.generate_content(prompt)
-        result = resp.text.strip() if resp.text else ""
-
-        if result.lower() == "true":
-            correction_cache.set(key, "True")
-            api_status.report_success()
-            return "True", True
-
-        corrected = result
-        correction_cache.set(key, corrected)
-        api_status.report_success()
+        async with sem:
+            corrected = await correction_flight.do(key, lambda: _gemini_correct(chunk.body, key, chunk.context))
         return corrected, True
 
+    except GeminiUnavailable:
+        return local_corrector.correct(chunk.body).text, False
     except Exception as e:
         logger.error(f"Error en Gemini (texto): {e}")
-        api_status.report_error(e)
-        return apply_basic_corrections(text), False
+        return local_corrector.correct(chunk.body).text, False
 
-async def describe_image(image_bytes: bytes) -> Tuple[str, bool]:
-    image_hash = hashlib.md5(image_bytes).hexdigest()
-    cached = description_cache.get(image_hash)
+async def correct_with_gemini(text: str) -> Tuple[str, bool]:
+    key = get_cache_key(text)
+    cached = await correction_cache.aget(key)
     if cached:
         return cached, True
 
-    if not gemini_vision_model or api_status.is_likely_quota_exceeded():
-        return "Descripción no disponible (límite de API alcanzado)", False
+    # Textos largos: se parten por párrafos/frases y los trozos se corrigen en paralelo
+    chunks = split_text(text)
+    sem = asyncio.Semaphore(CORRECTION_CHUNK_CONCURRENCY)
+    results = await asyncio.gather(*[_correct_chunk(chunk, sem) for chunk in chunks])
+    return await _assemble_correction(key, chunks, results)
+
+async def _assemble_correction(key: str, chunks: List[Chunk], results: List[Tuple[str, bool]]) -> Tuple[str, bool]:
+    used = all(used_g for _, used_g in results)
+
+    # "True" = ilegible. Si lo son todos los trozos, lo es el texto; si solo
+    # algunos, se deja su texto original
+    if all(result == "True" for chunk, (result, _) in zip(chunks, results) if chunk.body):
+        return "True", used
+    corrected = stitch(chunks, [
+        chunk.body if result == "True" else result
+        for chunk, (result, _) in zip(chunks, results)
+    ])
+    if used:
+        await correction_cache.aset(key, corrected)
+    return corrected, used
+
+async def describe_image(doc: UploadedDocument) -> Tuple[str, bool]:
+    cached = await description_cache.aget(doc.content_hash) or await _near_duplicate_description(doc)
+    if cached:
+        return cached, True
 
     try:
-        img = Image.open(BytesIO(image_bytes))
-        prompt = "SOLO responde con la descripción de esta imagen en detalle, incluyendo texto relevante y contexto. Sé preciso y conciso."
-        resp = gemini_vision_model.generate_content([prompt, img])
-        desc = resp.text or "No se pudo generar descripción"
-        description_cache.set(image_hash, desc)
-        api_status.report_success()
+        desc = await description_flight.do(doc.content_hash, lambda: _gemini_describe(doc))
         return desc, True
 
+    except GeminiUnavailable:
+        return "Descripción no disponible (límite de API alcanzado)", False
     except Exception as e:
         logger.error(f"Error describiendo imagen (vision): {e}")
-        api_status.report_error(e)
         return "Error generando descripción", False
 
 # --------------------------------------------------
-# OCR + procesamiento
+# Variantes en streaming (Server-Sent Events)
 # --------------------------------------------------
-async def process_image(file: UploadFile) -> Dict[str, str]:
-    data = await file.read()
-    img  = Image.open(BytesIO(data))
-
-    custom_cfg = r'--oem 3 --psm 6 -l spa+eng'
-    text = pytesseract.image_to_string(img, config=custom_cfg).strip()
-    if not text:
-        raise ValueError("OCR no detectó texto")
+# Eventos: "delta" ({"text"}) con cada trozo según lo genera Gemini y un
+# "done" final con la misma respuesta que el endpoint sin streaming. El texto
+# de "done" es el definitivo: si Gemini falla a mitad, sustituye a los deltas.
+def _sse(event: str, payload: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    # X-Accel-Buffering: que un proxy (nginx) no acumule los eventos
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _stream_chunk(chunk: Chunk, result: List[Tuple[str, bool]]):
+    # Corrige un trozo emitiendo el texto según llega. La respuesta "True"
+    # (ilegible) no se muestra: se retiene mientras lo emitido pueda serlo.
+    key = get_cache_key(chunk.body)
+    cached = await correction_cache.aget(key)
+    if cached:
+        result.append((cached, True))
+        yield chunk.body if cached == "True" else cached
+        return
+    local = _route_locally(chunk.body)
+    if local is not None:
+        result.append((local, False))
+        yield local
+        return
+
+    parts: List[str] = []
+    pending = ""
+    try:
+        async for delta in gemini.stream("text", _correction_prompt(chunk.body, chunk.context)):
+            if not parts:
+                delta = delta.lstrip()
+            parts.append(delta)
+            pending += delta
+            if "true".startswith(pending.strip().lower()):
+                continue
+            yield pending
+            pending = ""
+    except GeminiUnavailable:
+        result.append((local_corrector.correct(chunk.body).text, False))
+    except Exception as e:
+        logger.error(f"Error en Gemini (texto, stream): {e}")
+        result.append((local_corrector.correct(chunk.body).text, False))
+    else:
+        text = "".join(parts).strip()
+        corrected = "True" if text.lower() == "true" else text
+        await correction_cache.aset(key, corrected)
+        result.append((corrected, True))
+        if corrected == "True":
+            yield chunk.body
+        elif pending:
+            yield pending.rstrip()
+        return
+    if not parts:
+        yield result[-1][0]
+
+async def stream_correction(text: str):
+    key = get_cache_key(text)
+    cached = await correction_cache.aget(key)
+    if cached:
+        if cached != "True":
+            yield _sse("delta", {"text": cached})
+        yield _sse("done", _verify_response(text, cached, True))
+        return
+
+    # El primer trozo se emite según se genera; el resto se corrige a la vez
+    # en segundo plano y se emite en orden en cuanto le toca
+    chunks = split_text(text)
+    sem = asyncio.Semaphore(CORRECTION_CHUNK_CONCURRENCY)
+    tasks = [asyncio.create_task(_correct_chunk(chunk, sem)) for chunk in chunks[1:]]
+    results: List[Tuple[str, bool]] = []
+    try:
+        first = chunks[0]
+        if first.prefix:
+            yield _sse("delta", {"text": first.prefix})
+        if first.body:
+            async for delta in _stream_chunk(first, results):
+                yield _sse("delta", {"text": delta})
+        else:
+            results.append(("", True))
+        if first.suffix:
+            yield _sse("delta", {"text": first.suffix})
+
+        for chunk, task in zip(chunks[1:], tasks):
+            corrected, used_g = await task
+            results.append((corrected, used_g))
+            body = chunk.body if corrected == "True" else corrected
+            yield _sse("delta", {"text": chunk.prefix + body + chunk.suffix})
+    finally:
+        # Cliente desconectado: no seguir corrigiendo trozos que nadie leerá
+        for task in tasks:
+            task.cancel()
+
+    corrected, used = await _assemble_correction(key, chunks, results)
+    yield _sse("done", _verify_response(text, corrected, used))
+
+async def stream_description(doc: UploadedDocument):
+    cached = await description_cache.aget(doc.content_hash) or await _near_duplicate_description(doc)
+    if cached:
+        yield _sse("delta", {"text": cached})
+        yield _sse("done", _description_response(cached, True))
+        return
 
-    logger.info(f"OCR completado: {len(text)} caracteres")
+    parts: List[str] = []
+    try:
+        async for delta in gemini.stream("vision", await _vision_contents(doc)):
+            parts.append(delta)
+            yield _sse("delta", {"text": delta})
+        desc, used = "".join(parts) or "No se pudo generar descripción", True
+        await _remember_description(doc, desc)
+    except GeminiUnavailable:
+        desc, used = "Descripción no disponible (límite de API alcanzado)", False
+    except Exception as e:
+        logger.error(f"Error describiendo imagen (vision, stream): {e}")
+        desc, used = "Error generando descripción", False
+    yield _sse("done", _description_response(desc, used))
 
-    corrected, used_g = await correct_with_gemini(text)
+# --------------------------------------------------
+# OCR + procesamiento
+# --------------------------------------------------
+async def process_image_bytes(data: bytes) -> Dict[str, str]:
+    return await process_document(UploadedDocument(data))
+
+async def _stored_description(desc: str) -> Tuple[str, bool]:
+    return desc, True
+
+async def process_document(doc: UploadedDocument) -> Dict[str, str]:
+    # Lo ya calculado para esta misma imagen (y configuración de OCR) se
+    # reutiliza: una subida repetida no vuelve a pasar por Tesseract ni Gemini
+    stored = await asyncio.to_thread(result_store.get, doc.content_hash)
+
+    # La descripción solo depende de los bytes: arranca ya y corre en paralelo
+    # con la rama OCR -> corrección en lugar de esperar a que ésta termine
+    if "description" in stored:
+        describe_task = asyncio.create_task(_stored_description(stored["description"]))
+    else:
+        describe_task = asyncio.create_task(describe_image(doc))
+    try:
+        text = stored.get("ocr_text")
+        if text is None:
+            # El OCR se ejecuta en el pool del motor OCR, fuera del event loop. Con
+            # hilos comparte la imagen decodificada con la rama de descripción.
+            image = await doc.image() if ocr_engine.executor_kind == "thread" else None
+            text = await ocr_engine.run(doc.data, image=image)
+            await asyncio.to_thread(result_store.put, doc.content_hash, ocr_text=text)
+            logger.info(f"OCR completado: {len(text)} caracteres")
+        if not text:
+            raise ValueError("OCR no detectó texto")
+
+        if "corrected_text" in stored:
+            corrected, used_g = stored["corrected_text"], True
+        else:
+            corrected, used_g = await correct_with_gemini(text)
+            if used_g:
+                await asyncio.to_thread(result_store.put, doc.content_hash, corrected_text=corrected)
+    except BaseException:
+        # Si la rama OCR falla la respuesta no se construye: la descripción sobra
+        # (description_flight cancela la llamada a Gemini si nadie más la espera)
+        describe_task.cancel()
+        raise
+
+    desc, vision_used = await describe_task
+    if vision_used and "description" not in stored:
+        await asyncio.to_thread(result_store.put, doc.content_hash, description=desc)
 
     if corrected == "True":
-        desc, vision_used = await describe_image(data)
         return {
             "original_text":     "",
             "corrected_text":    "",
             "description":       desc,
             "correction_source": "none (sin texto)",
-            "vision_source":     "gemini-1.5-flash" if vision_used else "fallback",
+            "vision_source":     GEMINI_VISION_MODEL if vision_used else "fallback",
             "warnings":          [] if vision_used else ["Descripción limitada (sin Gemini Vision)"]
         }
 
-    desc, vision_used = await describe_image(data)
     return {
         "original_text":     text,
         "corrected_text":    corrected,
         "description":       desc,
-        "correction_source": "gemini" if used_g else "basic",
-        "vision_source":     "gemini-1.5-flash" if vision_used else "fallback",
-        "warnings":          [] if used_g else ["Usando correcciones básicas (sin Gemini)"]
+        "correction_source": "gemini" if used_g else "local",
+        "vision_source":     GEMINI_VISION_MODEL if vision_used else "fallback",
+        "warnings":          [] if used_g else ["Usando el corrector local (sin Gemini)"]
     }
 
 # --------------------------------------------------
@@ -243,36 +434,165 @@ async def process_image(file: UploadFile) -> Dict[str, str]:
 # --------------------------------------------------
 @app.post("/upload")
 async def upload_file(file: UploadFile):
-    header = await file.read(1024)
-    await file.seek(0)
-    mime = magic.from_buffer(header, mime=True)
-    if not mime.startswith("image/"):
+    doc = await UploadedDocument.from_upload(file)
+    if not doc.mime.startswith("image/"):
         raise HTTPException(400, "Solo se admiten imágenes (PNG/JPG/JPEG)")
 
-    res = await process_image(file)
+    try:
+        res = await process_document(doc)
+    except OCRQueueFull as e:
+        logger.warning(str(e))
+        raise HTTPException(503, "Servidor ocupado procesando OCR, inténtalo de nuevo", headers={"Retry-After": "5"})
     if api_status.is_likely_quota_exceeded():
         res["warnings"].append("Límite de cuota de Gemini alcanzado")
     return {"status": "success", "type": "image", **res}
 
-@app.post("/verify-text")
-async def verify_text(req: TextRequest):
-    if not req.text.strip():
-        raise HTTPException(400, "El texto no puede estar vacío")
-    corrected, used = await correct_with_gemini(req.text)
+# Subida por lotes: varias imágenes, TIFF multipágina o PDF. Las páginas se
+# procesan en paralelo y cada resultado se envía como una línea NDJSON en
+# cuanto termina (no en orden), con "file" y "page" para identificarlo.
+# Las páginas se rasterizan dentro del stream, a medida que hay hueco: como
+# mucho BATCH_CONCURRENCY páginas decodificadas en memoria a la vez.
+BATCH_MAX_PAGES   = int(os.getenv("BATCH_MAX_PAGES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(ocr_engine.workers)))
+
+async def _process_page(filename: str, page: int, doc: UploadedDocument) -> Dict:
+    try:
+        res = await process_document(doc)
+        return {"file": filename, "page": page, "status": "success", **res}
+    except OCRQueueFull:
+        return {"file": filename, "page": page, "status": "error", "detail": "Servidor ocupado procesando OCR"}
+    except Exception as e:
+        logger.error(f"Error procesando {filename} (página {page}): {e}")
+        return {"file": filename, "page": page, "status": "error", "detail": str(e)}
+
+async def _split_and_process(files: List[Tuple[str, UploadedDocument, int]], results: asyncio.Queue, tasks: list):
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(filename: str, page: int, doc: UploadedDocument):
+        try:
+            await results.put(await _process_page(filename, page, doc))
+        finally:
+            sem.release()
+
+    for filename, doc, n_pages in files:
+        pages = iter_pages(doc.data, doc.mime)
+        error = None
+        for page in range(1, n_pages + 1):
+            if error is None:
+                # La siguiente página solo se extrae cuando hay hueco para procesarla
+                await sem.acquire()
+                try:
+                    data = await asyncio.to_thread(next, pages)
+                except Exception as e:
+                    sem.release()
+                    logger.error(f"Error extrayendo {filename} (página {page}): {e}")
+                    error = f"No se pudo extraer la página: {e}"
+            if error is not None:
+                await results.put({"file": filename, "page": page, "status": "error", "detail": error})
+                continue
+            page_doc = doc if data is doc.data else UploadedDocument(data)
+            tasks.append(asyncio.create_task(run(filename, page, page_doc)))
+
+async def _stream_batch(files: List[Tuple[str, UploadedDocument, int]]):
+    total   = sum(n_pages for _, _, n_pages in files)
+    results: asyncio.Queue = asyncio.Queue()
+    tasks: list = []
+    producer = asyncio.create_task(_split_and_process(files, results, tasks))
+    errors = 0
+    try:
+        # Exactamente un resultado por página (correcto o error)
+        for _ in range(total):
+            result = await results.get()
+            errors += result["status"] == "error"
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        summary = {"status": "done", "pages": total, "errors": errors}
+        if api_status.is_likely_quota_exceeded():
+            summary["warning"] = "Límite de cuota de Gemini alcanzado"
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+    finally:
+        # Cliente desconectado: no seguir extrayendo ni procesando páginas que nadie leerá
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile]):
+    # Aquí solo se valida y se cuentan páginas; la rasterización va en el stream
+    batch: List[Tuple[str, UploadedDocument, int]] = []
+    total = 0
+    for file in files:
+        doc = await UploadedDocument.from_upload(file)
+        try:
+            n_pages = await asyncio.to_thread(count_pages, doc.data, doc.mime, BATCH_MAX_PAGES)
+        except UnsupportedDocument as e:
+            raise HTTPException(400, f"{file.filename}: {e}")
+        total += n_pages
+        if total > BATCH_MAX_PAGES:
+            raise HTTPException(413, f"El lote supera el máximo de {BATCH_MAX_PAGES} páginas")
+        batch.append((file.filename, doc, n_pages))
+
+    logger.info(f"Lote recibido: {len(files)} archivos, {total} páginas")
+    return StreamingResponse(_stream_batch(batch), media_type="application/x-ndjson")
+
+# --------------------------------------------------
+# Trabajos asíncronos: se encolan y se consultan después
+# --------------------------------------------------
+async def process_upload_job(data: bytes) -> Dict[str, str]:
+    try:
+        return await process_image_bytes(data)
+    except OCRQueueFull as e:
+        # El OCR ni siquiera empezó: no cuenta como intento
+        raise RetryLater(str(e), delay=5)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # La misma imagen fallaría igual en cada reintento
+        raise PermanentJobError(f"Imagen no válida: {e}")
+
+job_workers.register("upload", process_upload_job)
+
+@app.post("/jobs/upload", status_code=202)
+async def submit_upload_job(file: UploadFile):
+    doc = await UploadedDocument.from_upload(file)
+    if not doc.mime.startswith("image/"):
+        raise HTTPException(400, "Solo se admiten imágenes (PNG/JPG/JPEG)")
+    try:
+        job_id = await job_workers.submit("upload", doc.data)
+    except JobQueueFull as e:
+        logger.warning(str(e))
+        raise HTTPException(503, "Cola de trabajos llena, inténtalo de nuevo", headers={"Retry-After": "30"})
+    return {"status": QUEUED, "job_id": job_id, "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    job.pop("result")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    if job["status"] == FAILED:
+        # El fallo es el resultado del trabajo, no un error de este endpoint
+        return {"status": FAILED, "job_id": job_id, "error": job["error"], "attempts": job["attempts"]}
+    if job["status"] != DONE:
+        return JSONResponse(status_code=202, content={"status": job["status"], "job_id": job_id})
+    return {"status": "success", "type": "image", **job["result"]}
+
+def _verify_response(text: str, corrected: str, used: bool) -> Dict:
     resp = {
         "status":         "success",
-        "original_text":  req.text,
+        "original_text":  text,
         "corrected_text": corrected,
-        "correction_source": "gemini" if used else "basic"
+        "correction_source": "gemini" if used else "local"
     }
     if not used:
-        resp["warning"] = "Usando correcciones básicas (sin Gemini)"
+        resp["warning"] = "Usando el corrector local (sin Gemini)"
     return resp
 
-@app.post("/describe-image")
-async def describe_image_endpoint(file: UploadFile):
-    data = await file.read()
-    description, used = await describe_image(data)
+def _description_response(description: str, used: bool) -> Dict:
     resp = {
         "status":      "success",
         "description": description,
@@ -282,19 +602,134 @@ async def describe_image_endpoint(file: UploadFile):
         resp["warning"] = "Descripción limitada (sin Gemini)"
     return resp
 
+@app.post("/verify-text")
+async def verify_text(req: TextRequest):
+    if not req.text.strip():
+        raise HTTPException(400, "El texto no puede estar vacío")
+    corrected, used = await correct_with_gemini(req.text)
+    return _verify_response(req.text, corrected, used)
+
+@app.post("/verify-text/stream")
+async def verify_text_stream(req: TextRequest):
+    if not req.text.strip():
+        raise HTTPException(400, "El texto no puede estar vacío")
+    return _sse_response(stream_correction(req.text))
+
+@app.post("/describe-image")
+async def describe_image_endpoint(file: UploadFile):
+    doc = await UploadedDocument.from_upload(file)
+    description, used = await describe_image(doc)
+    return _description_response(description, used)
+
+@app.post("/describe-image/stream")
+async def describe_image_stream(file: UploadFile):
+    doc = await UploadedDocument.from_upload(file)
+    return _sse_response(stream_description(doc))
+
 @app.get("/api-status")
 async def get_api_status():
     return {
-        "gemini_available":      gemini_model is not None,
+        "gemini_available":      gemini.available,
         "last_error":            str(api_status.last_error) if api_status.last_error else None,
         "error_count":           api_status.error_count,
         "likely_quota_exceeded": api_status.is_likely_quota_exceeded(),
+        "gemini":                gemini.stats(),
+        "perceptual_index":      perceptual_index.stats(),
+        "result_store":          result_store.stats(),
+        "local_corrector":       local_corrector.stats(),
+        "singleflight": {
+            "correction":  correction_flight.stats(),
+            "description": description_flight.stats()
+        },
         "cache_stats": {
-            "correction_cache_size":  len(correction_cache.cache),
-            "description_cache_size": len(description_cache.cache)
-        }
+            "correction_cache_size":  len(correction_cache),
+            "description_cache_size": len(description_cache),
+            "correction":             correction_cache.stats(),
+            "description":            description_cache.stats()
+        },
+        "ocr": ocr_engine.stats(),
+        "database": db_pool.stats(),
+        "password_hashing": password_hasher.stats(),
+        "jobs": job_queue.stats()
     }
 
+# --------------------------------------------------
+# Métricas (formato Prometheus)
+# --------------------------------------------------
+@metrics_registry.collector
+def _collect_runtime_metrics():
+    # Se leen al exportar los contadores que ya llevan cachés, pools y colas
+    hits, misses, ratios, sizes = [], [], [], []
+    for name, cache in (("correction", correction_cache), ("description", description_cache)):
+        for tier, st in cache.stats().items():
+            labels = {"cache": name, "tier": tier}
+            lookups = st["hits"] + st["misses"]
+            hits.append((labels, st["hits"]))
+            misses.append((labels, st["misses"]))
+            ratios.append((labels, st["hits"] / lookups if lookups else 0.0))
+            sizes.append((labels, st["size"]))
+
+    ocr, gem, db = ocr_engine.stats(), gemini.stats(), db_pool.stats()
+    in_flight = [
+        ({"component": "ocr"},              ocr["in_flight"]),
+        ({"component": "ocr_queue"},        ocr["queue_depth"]),
+        ({"component": "gemini"},           gem["in_flight"]),
+        ({"component": "db"},               db["in_use"]),
+        ({"component": "password_hashing"}, password_hasher.stats()["in_flight"]),
+        ({"component": "correction_flight"},  correction_flight.stats()["in_flight"]),
+        ({"component": "description_flight"}, description_flight.stats()["in_flight"]),
+    ]
+    return [
+        ("tfg_cache_hits_total",      "counter", "Aciertos de caché", hits),
+        ("tfg_cache_misses_total",    "counter", "Fallos de caché", misses),
+        ("tfg_cache_hit_ratio",       "gauge",   "Aciertos / consultas desde el arranque", ratios),
+        ("tfg_cache_entries",         "gauge",   "Entradas en caché", sizes),
+        ("tfg_in_flight",             "gauge",   "Trabajos en curso por componente", in_flight),
+        ("tfg_ocr_jobs_total",        "counter", "Trabajos OCR terminados por resultado",
+            [({"result": r}, ocr[r]) for r in ("completed", "failed", "rejected")]),
+        ("tfg_gemini_calls_total",    "counter", "Llamadas a Gemini", [({}, gem["calls"])]),
+        ("tfg_gemini_retries_total",  "counter", "Reintentos de llamadas a Gemini", [({}, gem["retries"])]),
+        ("tfg_gemini_timeouts_total", "counter", "Intentos de Gemini que agotaron el tiempo", [({}, gem["timeouts"])]),
+        ("tfg_gemini_circuit_state",  "gauge",   "Estado del circuit breaker de Gemini (1 = activo)",
+            [({"state": state}, int(gem["circuit_state"] == state)) for state in ("closed", "open", "half_open")]),
+        ("tfg_db_pool_timeouts_total", "counter", "Esperas de conexión que agotaron el tiempo", [({}, db["timeouts"])]),
+        ("tfg_jobs",                  "gauge",   "Trabajos en la cola por estado",
+            [({"status": status}, count) for status, count in job_queue.stats().items()]),
+    ]
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("startup")
+def configure_gemini():
+    gemini.configure(GEMINI_API_KEY)
+
+@app.on_event("startup")
+def start_job_workers():
+    job_workers.start()
+
+@app.on_event("startup")
+def load_local_corrector():
+    # En segundo plano: el arranque no espera a construir el índice
+    local_corrector.start_loading()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_workers.stop()
+
+@app.on_event("shutdown")
+def shutdown_ocr_engine():
+    ocr_engine.shutdown(wait=True)
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db_pool.close()
+
 # --------------------------------------------------
 # Autenticación y ajustes
 # --------------------------------------------------
@@ -309,81 +744,243 @@ def get_me(current_user: dict = Depends(get_current_user)):
         "is_admin": current_user["is_admin"]
     }
 
-@app.get("/me/settings", response_model=schemas.UserSettingsOut)
-def read_my_settings(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+# Ajustes: versionados por ETag (hash del JSON) para que el frontend pueda
+# revalidar con If-None-Match y recibir 304 sin cuerpo. Caché por usuario
+# compartida entre workers (SQLite): tras un PUT en un worker, la recarga de la
+# página en otro ve ya los ajustes nuevos. Los endpoints son síncronos (se
+# ejecutan en el threadpool), así que leerla no bloquea el event loop.
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "300"))
+settings_cache = make_shared_cache("settings", maxsize=10000, ttl=timedelta(seconds=SETTINGS_CACHE_TTL))
+
+def _settings_body(row: Dict) -> str:
+    return schemas.UserSettingsOut(**row).model_dump_json()
+
+def _settings_etag(body: str) -> str:
+    return '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match admite una lista, "*" y etiquetas débiles (W/"...")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def _settings_response(request: Request, body: str) -> Response:
+    etag = _settings_etag(body)
+    # private, no-cache: el navegador guarda la respuesta pero revalida siempre
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.method == "GET" and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _upsert_settings(db, user_id: int, fields: Dict[str, str]) -> Dict:
+    # Una sola sentencia atómica: crea la fila si no existe y si existe solo
+    # cambia las columnas recibidas (las demás conservan su valor o el DEFAULT)
+    columns = [sql.Identifier(name) for name in fields]
+    if columns:
+        on_conflict = sql.SQL("DO UPDATE SET {}").format(sql.SQL(", ").join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(column) for column in columns
+        ))
+    else:
+        # Sin cambios: DO UPDATE trivial para que RETURNING devuelva la fila
+        on_conflict = sql.SQL("DO UPDATE SET user_id = EXCLUDED.user_id")
+    query = sql.SQL("""
+        INSERT INTO user_settings ({columns})
+        VALUES ({values})
+        ON CONFLICT (user_id) {on_conflict}
+        RETURNING *
+    """).format(
+        columns=sql.SQL(", ").join([sql.Identifier("user_id"), *columns]),
+        values=sql.SQL(", ").join(sql.Placeholder() * (len(columns) + 1)),
+        on_conflict=on_conflict,
+    )
     with db.cursor() as cur:
-        cur.execute("SELECT * FROM user_settings WHERE user_id = %s", (current_user["id"],))
-        settings = cur.fetchone()
+        cur.execute(query, (user_id, *fields.values()))
+        row = cur.fetchone()
+    db.commit()
+    return row
+
+def _write_settings(request: Request, db, user_id: int, fields: Dict[str, str]) -> Response:
+    body = _settings_body(_upsert_settings(db, user_id, fields))
+    settings_cache.set(str(user_id), body)
+    return _settings_response(request, body)
+
+@app.get("/me/settings", response_model=schemas.UserSettingsOut)
+def read_my_settings(request: Request, current_user: dict = Depends(get_current_user)):
+    user_id = current_user["id"]
+    body = settings_cache.get(str(user_id))
+    if body is None:
+        with db_connection() as db, db.cursor() as cur:
+            cur.execute("SELECT * FROM user_settings WHERE user_id = %s", (user_id,))
+            settings = cur.fetchone()
         if not settings:
             raise HTTPException(status_code=404, detail="No se encontraron ajustes para este usuario")
-        return settings
+        body = _settings_body(settings)
+        settings_cache.set(str(user_id), body)
+    return _settings_response(request, body)
 
 @app.put("/me/settings", response_model=schemas.UserSettingsOut)
 def update_my_settings(
+    request: Request,
     settings_in: schemas.UserSettingsUpdate,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
-    with db.cursor() as cur:
-        cur.execute("SELECT * FROM user_settings WHERE user_id = %s", (current_user["id"],))
-        settings = cur.fetchone()
-        if not settings:
-            cur.execute("""
-                INSERT INTO user_settings 
-                    (user_id, font_size, font_family, text_color, background_color, rate, pitch, volume)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING *
-            """, (
-                current_user["id"], settings_in.font_size, settings_in.font_family,
-                settings_in.text_color, settings_in.background_color,
-                settings_in.rate, settings_in.pitch, settings_in.volume
-            ))
-            db.commit()
-            return cur.fetchone()
-        cur.execute("""
-            UPDATE user_settings SET
-                font_size=%s, font_family=%s, text_color=%s, background_color=%s,
-                rate=%s, pitch=%s, volume=%s
-            WHERE user_id=%s
-            RETURNING *
-        """, (
-            settings_in.font_size, settings_in.font_family, settings_in.text_color, settings_in.background_color,
-            settings_in.rate, settings_in.pitch, settings_in.volume,
-            current_user["id"]
-        ))
-        db.commit()
-        return cur.fetchone()
+    return _write_settings(request, db, current_user["id"], settings_in.model_dump())
 
-@app.get("/admin/users", response_model=List[schemas.UserOut])
-def get_all_users(
+@app.patch("/me/settings", response_model=schemas.UserSettingsOut)
+def patch_my_settings(
+    request: Request,
+    settings_in: schemas.UserSettingsPatch,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_db)
 ):
+    # Solo los campos enviados (y no nulos): la sincronización de un ajuste
+    # suelto no reescribe el resto
+    fields = {k: v for k, v in settings_in.model_dump(exclude_unset=True).items() if v is not None}
+    return _write_settings(request, db, current_user["id"], fields)
+
+# --------------------------------------------------
+# Administración de usuarios
+# --------------------------------------------------
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "100"))
+ADMIN_PAGE_MAX  = int(os.getenv("ADMIN_PAGE_MAX", "1000"))
+ADMIN_EXPORT_BATCH = 2000
+
+def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
     if current_user["is_admin"] != 1:
         raise HTTPException(status_code=403, detail="Acceso denegado")
+    return current_user
+
+def _like_prefix(q: str) -> str:
+    # El prefijo se busca literalmente: se escapan los comodines de LIKE
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
 
+@app.get("/admin/users", response_model=List[schemas.UserOut])
+def get_all_users(
+    response: Response,
+    after_id: int = 0,
+    limit: int = ADMIN_PAGE_SIZE,
+    q: Optional[str] = None,
+    admin: dict = Depends(require_admin),
+    db = Depends(get_db)
+):
+    # Paginación por clave (id > after_id), no por OFFSET: cada página cuesta lo
+    # mismo aunque haya 100k usuarios. El cuerpo sigue siendo la lista; el cursor
+    # de la página siguiente va en X-Next-Cursor (ausente en la última página).
+    limit = max(1, min(limit, ADMIN_PAGE_MAX))
+    query = "SELECT id, username, is_admin FROM users WHERE id > %s"
+    params: list = [after_id]
+    if q:
+        query += " AND username LIKE %s"
+        params.append(_like_prefix(q))
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit + 1)
+
+    with db.cursor() as cur:
+        cur.execute(query, params)
+        users = cur.fetchall()
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = str(users[-1]["id"])
+    return users
+
+def _export_users_csv():
+    # Cursor con nombre (del lado del servidor): las filas llegan por lotes y
+    # la memoria no crece con el número de usuarios
+    with db_connection() as db:
+        try:
+            with db.cursor(name="admin_users_export") as cur:
+                cur.itersize = ADMIN_EXPORT_BATCH
+                cur.execute("SELECT id, username, is_admin FROM users ORDER BY id")
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(("id", "username", "is_admin"))
+                for i, row in enumerate(cur, 1):
+                    writer.writerow((row["id"], row["username"], row["is_admin"]))
+                    if i % ADMIN_EXPORT_BATCH == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+        finally:
+            db.rollback()
+
+@app.get("/admin/users/export")
+def export_users(admin: dict = Depends(require_admin)):
+    return StreamingResponse(
+        _export_users_csv(), media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'}
+    )
+
+@app.post("/admin/users/bulk")
+def bulk_users(
+    req: schemas.AdminBulkAction,
+    admin: dict = Depends(require_admin),
+    db = Depends(get_db)
+):
+    # Todo en una transacción con = ANY(%s): una sentencia para N usuarios. El
+    # administrador que hace la petición queda fuera (no puede borrarse ni
+    # quitarse el rol a sí mismo).
+    if req.action == "set_admin" and req.is_admin not in (0, 1):
+        raise HTTPException(status_code=422, detail="set_admin requiere is_admin 0 o 1")
+    ids = [user_id for user_id in set(req.ids) if user_id != admin["id"]]
     with db.cursor() as cur:
-        cur.execute("SELECT id, username, is_admin FROM users")
-        return cur.fetchall()
+        if req.action == "delete":
+            # ON DELETE CASCADE borra sus ajustes
+            cur.execute("DELETE FROM users WHERE id = ANY(%s) RETURNING username", (ids,))
+        else:
+            cur.execute("UPDATE users SET is_admin = %s WHERE id = ANY(%s) RETURNING username", (req.is_admin, ids))
+        affected = [row["username"] for row in cur.fetchall()]
+    db.commit()
+    # Los demás workers pueden aceptar sus tokens hasta AUTH_CACHE_TTL segundos más
+    for username in affected:
+        invalidate_user(username)
+    return {"action": req.action, "requested": len(req.ids), "affected": len(affected)}
 
 @app.delete("/admin/users/{user_id}")
 def delete_user(
     user_id: int,
-    current_user: dict = Depends(get_current_user),
+    admin: dict = Depends(require_admin),
     db = Depends(get_db)
 ):
-    if current_user["is_admin"] != 1:
-        raise HTTPException(status_code=403, detail="Acceso denegado")
-
+    # ON DELETE CASCADE borra sus ajustes
     with db.cursor() as cur:
-        cur.execute("DELETE FROM user_settings WHERE user_id = %s", (user_id,))
-        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        db.commit()
+        cur.execute("DELETE FROM users WHERE id = %s RETURNING username", (user_id,))
+        deleted = cur.fetchone()
+    db.commit()
+    # Los demás workers pueden aceptar su token hasta AUTH_CACHE_TTL segundos más
+    if deleted:
+        invalidate_user(deleted["username"])
     return {"message": "Usuario eliminado"}
 
 # --------------------------------------------------
-# Health check endpoint
+# Health check endpoints
 # --------------------------------------------------
+@app.get("/health/live")
+def liveness():
+    # El proceso responde: sin comprobar dependencias, para que una caída de la
+    # base de datos no haga reiniciar el contenedor
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    # Listo para recibir tráfico: base de datos accesible y sin apagado en curso.
+    # Gemini y el corrector local no cuentan: sin ellos se responde con fallbacks.
+    if job_workers.stopping:
+        raise HTTPException(status_code=503, detail="Apagando: terminando trabajos en curso")
+    try:
+        with db_connection() as db, db.cursor() as cur:
+            cur.execute("SELECT 1")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
+    return {
+        "status":           "ready",
+        "database":         "connected",
+        "gemini_available": gemini.available,
+        "local_corrector":  local_corrector.ready,
+    }
+
 @app.get("/health")
 def health_check(db = Depends(get_db)):
     try:
@@ -392,7 +989,7 @@ def health_check(db = Depends(get_db)):
         return {
             "status": "healthy",
             "database": "connected",
-            "gemini_available": gemini_model is not None
+            "gemini_available": gemini.available
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
@@ -407,6 +1004,9 @@ def read_root():
 # --------------------------------------------------
 # Arranque
 # --------------------------------------------------
+# Producción: gunicorn -c gunicorn_conf.py main:app (varios workers, ver
+# gunicorn_conf.py). Esto es un único proceso para desarrollo; con recarga
+# automática: uvicorn main:app --reload
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,225 @@
+# backend/metrics.py
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# --------------------------------------------------
+# Métricas en formato de exposición de Prometheus (texto), sin dependencias.
+# Cada worker tiene las suyas: con varios workers, Prometheus debe consultar
+# cada uno (o sumar por instancia).
+# --------------------------------------------------
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = labelnames
+        self._lock      = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: [conteo por cubo (no acumulado)..., +Inf], suma
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        # Colectores: se llaman al exportar y devuelven (nombre, tipo, ayuda, [(etiquetas, valor)]).
+        # Sirven para publicar contadores que ya existen (stats() de cachés, pools...)
+        # sin tocar el camino de cada petición.
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, fn: Callable):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        blocks = [metric.render() for metric in self._metrics]
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+                blocks.append("\n".join(lines))
+        return "\n".join(blocks) + "\n"
+
+registry = Registry()
+
+# --------------------------------------------------
+# Métricas comunes
+# --------------------------------------------------
+# Etapas: mime_sniff, decode, ocr, ocr_wait, gemini_text, gemini_vision, db, db_wait
+STAGE_SECONDS = registry.histogram(
+    "tfg_stage_duration_seconds", "Duración de cada etapa del pipeline", ("stage",)
+)
+REQUESTS = registry.counter(
+    "tfg_http_requests_total", "Peticiones HTTP por endpoint y código de estado", ("method", "route", "status")
+)
+REQUEST_SECONDS = registry.histogram(
+    "tfg_http_request_duration_seconds", "Duración de las peticiones HTTP (hasta enviar el cuerpo completo)", ("method", "route")
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "tfg_http_requests_in_flight", "Peticiones HTTP en curso"
+)
+REQUESTS_IN_FLIGHT.set(0)
+GEMINI_TOKENS = registry.counter(
+    "tfg_gemini_tokens_total", "Tokens consumidos en Gemini", ("kind", "type")
+)
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+def stage_timer(stage: str):
+    return STAGE_SECONDS.time(stage=stage)
+
+def record_gemini_usage(kind: str, usage) -> None:
+    # usage_metadata de la respuesta (en streaming, la del último trozo)
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = getattr(usage, "candidates_token_count", 0) or 0
+    if prompt:
+        GEMINI_TOKENS.inc(prompt, kind=kind, type="prompt")
+    if output:
+        GEMINI_TOKENS.inc(output, kind=kind, type="output")
+
+# --------------------------------------------------
+# Middleware ASGI: contadores, duración y peticiones en curso por endpoint
+# --------------------------------------------------
+class MetricsMiddleware:
+    # ASGI puro (no BaseHTTPMiddleware): no envuelve la respuesta en otra tarea
+    # y mide las respuestas en streaming hasta el último trozo
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Plantilla de la ruta ("/jobs/{job_id}"), no la URL: cardinalidad acotada
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(method=scope["method"], route=route, status=str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], route=route)
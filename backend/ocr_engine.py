@@ -0,0 +1,141 @@
+# backend/ocr_engine.py
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+import pytesseract
+
+from preprocess import prepare_for_ocr
+from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración del motor OCR (desde variables de entorno)
+# --------------------------------------------------
+OCR_CONFIG      = r'--oem 3 --psm 6 -l spa+eng'
+OCR_EXECUTOR    = os.getenv("OCR_EXECUTOR", "process")   # "process" | "thread"
+OCR_WORKERS     = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", OCR_WORKERS * 4))
+
+class OCRQueueFull(Exception):
+    """Se lanza cuando ya hay demasiados trabajos OCR en curso o en cola."""
+    pass
+
+def _run_tesseract(data: bytes, config: str) -> Tuple[str, float]:
+    # Se ejecuta dentro del worker (proceso o hilo): decodifica, preprocesa y lanza Tesseract
+    return _run_tesseract_image(Image.open(BytesIO(data)), config)
+
+def _run_tesseract_image(img: Image.Image, config: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(prepare_for_ocr(img), config=config).strip()
+    return text, time.perf_counter() - start
+
+class OCREngine:
+    def __init__(self, executor: str = OCR_EXECUTOR, workers: int = OCR_WORKERS, max_pending: int = OCR_MAX_PENDING):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"OCR_EXECUTOR no válido: {executor}")
+        self.executor_kind = executor
+        self.workers       = max(1, workers)
+        self.max_pending   = max(1, max_pending)
+        self._executor     = None
+        self._lock         = threading.Lock()
+
+        # Métricas
+        self.pending         = 0
+        self.completed       = 0
+        self.failed          = 0
+        self.rejected        = 0
+        self.total_wall_time = 0.0
+        self.total_ocr_time  = 0.0
+        self.max_wall_time   = 0.0
+
+    def _get_executor(self):
+        # Creación perezosa: el pool se crea en el primer trabajo, no al importar
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+                    logger.info(f"Motor OCR iniciado ({self.executor_kind}, {self.workers} workers, máx. {self.max_pending} trabajos)")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    async def run(self, data: bytes, config: str = OCR_CONFIG, image: Optional[Image.Image] = None) -> str:
+        # Con hilos se reutiliza la imagen ya decodificada; un proceso necesita los bytes
+        if self.executor_kind == "thread" and image is not None:
+            fn, arg = _run_tesseract_image, image
+        else:
+            fn, arg = _run_tesseract, data
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise OCRQueueFull(f"Cola OCR llena ({self.pending}/{self.max_pending})")
+            self.pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            cf = self._get_executor().submit(fn, arg, config)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        # El contador se libera cuando termina el trabajo real, aunque el cliente cancele
+        cf.add_done_callback(lambda f: self._job_done(f, submitted))
+        text, ocr_time = await asyncio.wrap_future(cf)
+        wall = time.perf_counter() - submitted
+        # "ocr" es el tiempo de Tesseract (con preprocesado); "ocr_wait", la cola y el traspaso al worker
+        observe_stage("ocr", ocr_time)
+        observe_stage("ocr_wait", max(0.0, wall - ocr_time))
+        logger.info(f"OCR en {ocr_time * 1000:.0f} ms (total {wall * 1000:.0f} ms)")
+        return text
+
+    def _job_done(self, future, submitted: float):
+        wall = time.perf_counter() - submitted
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+                return
+            self.completed       += 1
+            self.total_wall_time += wall
+            self.total_ocr_time  += future.result()[1]
+            self.max_wall_time    = max(self.max_wall_time, wall)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "executor":         self.executor_kind,
+                "workers":          self.workers,
+                "max_pending":      self.max_pending,
+                "in_flight":        self.pending,
+                "queue_depth":      self.queue_depth,
+                "completed":        self.completed,
+                "failed":           self.failed,
+                "rejected":         self.rejected,
+                "avg_wall_time_ms": round(self.total_wall_time / done * 1000, 1),
+                "avg_ocr_time_ms":  round(self.total_ocr_time / done * 1000, 1),
+                "max_wall_time_ms": round(self.max_wall_time * 1000, 1),
+            }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+ocr_engine = OCREngine()
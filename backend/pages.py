@@ -0,0 +1,67 @@
+# backend/pages.py
+import os
+import logging
+from io import BytesIO
+from typing import Iterator
+
+from PIL import Image, ImageSequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+    from pdf2image.exceptions import PDFInfoNotInstalledError
+except ImportError:  # pdf2image (y poppler) son opcionales: sin ellos no se aceptan PDF
+    convert_from_bytes = pdfinfo_from_bytes = None
+
+PDF_DPI = int(os.getenv("PDF_DPI", "300"))
+
+class UnsupportedDocument(ValueError):
+    pass
+
+def _encode_png(img: Image.Image) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def count_pages(data: bytes, mime: str, max_pages: int) -> int:
+    # Valida el documento y cuenta sus páginas sin rasterizar ni decodificar ninguna
+    if mime == "application/pdf":
+        if convert_from_bytes is None:
+            raise UnsupportedDocument("El servidor no tiene soporte para PDF (pdf2image/poppler)")
+        try:
+            n_pages = int(pdfinfo_from_bytes(data)["Pages"])
+        except PDFInfoNotInstalledError:
+            raise UnsupportedDocument("El servidor no tiene soporte para PDF (pdf2image/poppler)")
+        except Exception as e:
+            raise UnsupportedDocument(f"PDF no válido: {e}")
+    elif mime.startswith("image/"):
+        try:
+            n_pages = getattr(Image.open(BytesIO(data)), "n_frames", 1)
+        except Exception as e:
+            raise UnsupportedDocument(f"Imagen no válida: {e}")
+    else:
+        raise UnsupportedDocument("Solo se admiten imágenes (PNG/JPG/JPEG/TIFF) o PDF")
+    if n_pages > max_pages:
+        raise UnsupportedDocument(f"El documento supera el máximo de {max_pages} páginas")
+    return n_pages
+
+def iter_pages(data: bytes, mime: str) -> Iterator[bytes]:
+    # Una imagen codificada por página, generada al pedirla: en memoria solo
+    # está la página en curso, no el documento entero rasterizado. Las imágenes
+    # de una sola página se devuelven tal cual, sin recodificar. Bloqueante:
+    # desde código async, cada next() con asyncio.to_thread.
+    if mime == "application/pdf":
+        n_pages = int(pdfinfo_from_bytes(data)["Pages"])
+        for page in range(1, n_pages + 1):
+            image = convert_from_bytes(data, dpi=PDF_DPI, first_page=page, last_page=page)[0]
+            yield _encode_png(image)
+        return
+
+    img = Image.open(BytesIO(data))
+    if getattr(img, "n_frames", 1) <= 1:
+        yield data
+        return
+    # TIFF multipágina (u otros formatos con varios frames)
+    for frame in ImageSequence.Iterator(img):
+        yield _encode_png(frame.copy())
@@ -0,0 +1,93 @@
+# backend/passwords.py
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+BCRYPT_ROUNDS    = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS     = int(os.getenv("HASH_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+
+# min/max iguales al coste actual: needs_update() detecta hashes con otro coste
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+class HashQueueFull(Exception):
+    pass
+
+class PasswordHasher:
+    # bcrypt en un pool de hilos propio y acotado: una avalancha de logins no
+    # ocupa el threadpool de FastAPI ni el event loop
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers     = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending     = 0
+        self.rejected    = 0
+        self._lock       = threading.Lock()
+        self._executor   = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashQueueFull(f"Cola de hashing llena ({self.pending}/{self.max_pending})")
+            self.pending += 1
+        try:
+            cf = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        cf.add_done_callback(self._job_done)
+        return await asyncio.wrap_future(cf)
+
+    def _job_done(self, _):
+        with self._lock:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed)
+
+    @staticmethod
+    def needs_rehash(hashed: str) -> bool:
+        return pwd_context.needs_update(hashed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers":     self.workers,
+                "max_pending": self.max_pending,
+                "in_flight":   self.pending,
+                "rejected":    self.rejected,
+                "rounds":      BCRYPT_ROUNDS,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,221 @@
+# backend/phash.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from PIL import Image, ImageOps
+
+from cache import CACHE_DB_PATH, CACHE_L2_MAXSIZE_FACTOR
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+PHASH_SIZE         = int(os.getenv("PHASH_SIZE", "16"))           # dHash de PHASH_SIZE^2 bits
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "10"))   # distancia de Hamming máxima
+PHASH_SYNC_EVERY   = float(os.getenv("PHASH_SYNC_EVERY", "5"))    # segundos entre lecturas de otros workers
+# Tantas entradas como descripciones guarda la caché L2 (100 * factor): más
+# allá, la descripción de la imagen indexada ya se habría expulsado
+PHASH_MAX_ENTRIES  = int(os.getenv("PHASH_MAX_ENTRIES", str(100 * CACHE_L2_MAXSIZE_FACTOR)))
+
+def dhash(img: Image.Image, size: int = PHASH_SIZE) -> int:
+    # Difference hash: compara cada píxel con su vecino derecho en una miniatura
+    # en gris. Resiste recompresión, cambios de resolución y pequeños ajustes.
+    small = ImageOps.exif_transpose(img).convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = small.load()
+    value = 0
+    for y in range(size):
+        for x in range(size):
+            value = (value << 1) | (pixels[x, y] > pixels[x + 1, y])
+    return value
+
+class MultiIndexHash:
+    # Multi-index hashing: los bits del hash se reparten en max_distance // 2 + 1
+    # trozos con una tabla (trozo -> hashes) por trozo. Si dos hashes están a
+    # distancia <= r, algún trozo está a distancia <= 1 (palomar: si todos
+    # difirieran en 2 o más bits la distancia superaría r), así que basta con
+    # mirar en cada tabla el trozo de la consulta y los que difieren en un bit,
+    # y verificar la distancia completa de los candidatos.
+    #
+    # Los trozos no son bits contiguos sino uno de cada n_chunks: en un
+    # documento los márgenes en blanco dan filas enteras de ceros, y un trozo
+    # contiguo valdría lo mismo en casi todas las páginas (un cubo enorme que
+    # convierte cada búsqueda en un recorrido completo).
+    def __init__(self, bits: int, max_distance: int = PHASH_MAX_DISTANCE):
+        self.bits         = bits
+        self.max_distance = max_distance
+        self.n_chunks     = max_distance // 2 + 1
+        self.chunk_bits   = [[1 << bit for bit in range(i, bits, self.n_chunks)] for i in range(self.n_chunks)]
+        self.masks        = [sum(chunk) for chunk in self.chunk_bits]
+        self.tables: List[Dict[int, Set[int]]] = [{} for _ in range(self.n_chunks)]
+        self.keys: Dict[int, str] = {}     # hash -> clave
+        self.values: Dict[str, int] = {}   # clave -> hash, en orden de inserción
+
+    def add(self, value: int, key: str):
+        self.remove(key)
+        if value not in self.keys:
+            for table, mask in zip(self.tables, self.masks):
+                table.setdefault(value & mask, set()).add(value)
+        self.keys[value] = key
+        self.values[key] = value
+
+    def remove(self, key: str):
+        value = self.values.pop(key, None)
+        if value is None or self.keys.get(value) != key:
+            return
+        del self.keys[value]
+        for table, mask in zip(self.tables, self.masks):
+            bucket = table[value & mask]
+            bucket.discard(value)
+            if not bucket:
+                del table[value & mask]
+
+    def oldest(self) -> Optional[str]:
+        return next(iter(self.values), None)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, str]]:
+        # Todas las coincidencias a distancia <= max_distance, de la más cercana a la más lejana
+        if max_distance > self.max_distance:
+            raise ValueError(f"El índice se construyó para distancias <= {self.max_distance}")
+        matches: List[Tuple[int, int]] = []
+        seen: Set[int] = set()
+        for table, mask, chunk_bits in zip(self.tables, self.masks, self.chunk_bits):
+            chunk = value & mask
+            for probe in (chunk, *(chunk ^ bit for bit in chunk_bits)):
+                for candidate in table.get(probe, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = (candidate ^ value).bit_count()
+                    if distance <= max_distance:
+                        matches.append((distance, candidate))
+        matches.sort()
+        return [(distance, self.keys[candidate]) for distance, candidate in matches]
+
+    def largest_bucket(self) -> int:
+        return max((len(bucket) for table in self.tables for bucket in table.values()), default=0)
+
+    def __len__(self):
+        return len(self.values)
+
+# --------------------------------------------------
+# Índice persistente: hash perceptual -> hash de contenido (MD5)
+# --------------------------------------------------
+class PerceptualIndex:
+    # Cada cuántas inserciones se recorta la tabla a maxsize filas
+    EVICT_EVERY = 50
+
+    def __init__(self, path: str = CACHE_DB_PATH, size: int = PHASH_SIZE, max_distance: int = PHASH_MAX_DISTANCE,
+                 maxsize: int = PHASH_MAX_ENTRIES):
+        self.path         = path
+        self.size         = size
+        self.max_distance = max_distance
+        self.maxsize      = maxsize
+        self.index        = MultiIndexHash(size * size, max_distance)
+        self.hits         = 0
+        self.misses       = 0
+        self.evictions    = 0
+        self._writes      = 0
+        self._last_rowid  = 0
+        self._last_sync   = 0.0
+        self._lock        = threading.Lock()
+        self._local       = threading.local()
+        try:
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS phash_index (content_hash TEXT PRIMARY KEY, phash TEXT NOT NULL, size INTEGER NOT NULL)"
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo abrir el índice perceptual en {path}: {e}. Solo se usará memoria")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión heredada de otro proceso (fork de gunicorn --preload) no se reutiliza
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid  = os.getpid()
+        return conn
+
+    def _sync(self):
+        # Carga las entradas añadidas por otros workers (o antes del reinicio)
+        now = time.monotonic()
+        if now - self._last_sync < PHASH_SYNC_EVERY:
+            return
+        self._last_sync = now
+        try:
+            rows = self._conn().execute(
+                "SELECT rowid, content_hash, phash FROM phash_index WHERE rowid > ? AND size = ? ORDER BY rowid",
+                (self._last_rowid, self.size)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo índice perceptual: {e}")
+            return
+        for rowid, content_hash, value in rows:
+            self._add(int(value, 16), content_hash)
+            self._last_rowid = rowid
+
+    def _add(self, value: int, content_hash: str):
+        # En memoria se descartan las entradas más antiguas (con _lock tomado)
+        self.index.add(value, content_hash)
+        while len(self.index) > self.maxsize:
+            self.index.remove(self.index.oldest())
+
+    def compute(self, img: Image.Image) -> int:
+        return dhash(img, self.size)
+
+    def lookup(self, value: int) -> List[Tuple[int, str]]:
+        # Coincidencias (distancia, hash de contenido), de la más cercana a la más lejana
+        with self._lock:
+            self._sync()
+            matches = self.index.search(value, self.max_distance)
+        if matches:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return matches
+
+    def add(self, value: int, content_hash: str):
+        with self._lock:
+            self._add(value, content_hash)
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO phash_index (content_hash, phash, size) VALUES (?, ?, ?)",
+                (content_hash, format(value, "x"), self.size)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                # INSERT OR REPLACE da un rowid nuevo: se conservan las más recientes
+                cur = conn.execute(
+                    "DELETE FROM phash_index WHERE rowid IN (SELECT rowid FROM phash_index ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,)
+                )
+                self.evictions += max(cur.rowcount, 0)
+        except sqlite3.Error as e:
+            logger.warning(f"Error guardando en índice perceptual: {e}")
+
+    def remove(self, content_hash: str):
+        # Entrada cuya descripción ya no está en caché: no sirve para reutilizarla
+        with self._lock:
+            self.index.remove(content_hash)
+        try:
+            self._conn().execute("DELETE FROM phash_index WHERE content_hash = ?", (content_hash,))
+        except sqlite3.Error as e:
+            logger.warning(f"Error borrando del índice perceptual: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size":         len(self.index),
+            "max_size":     self.maxsize,
+            "hits":         self.hits,
+            "misses":       self.misses,
+            "evictions":    self.evictions,
+            "max_distance": self.max_distance,
+        }
+
+perceptual_index = PerceptualIndex()
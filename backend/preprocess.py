@@ -0,0 +1,128 @@
+# backend/preprocess.py
+import os
+import math
+import time
+import logging
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+OCR_PREPROCESS   = os.getenv("OCR_PREPROCESS", "1") == "1"
+OCR_TARGET_DPI   = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_MAX_PIXELS   = int(os.getenv("OCR_MAX_PIXELS", str(12_000_000)))
+OCR_BINARIZE     = os.getenv("OCR_BINARIZE", "1") == "1"
+VISION_MAX_SIDE  = int(os.getenv("VISION_MAX_SIDE", "1600"))
+VISION_MAX_BYTES = int(os.getenv("VISION_MAX_BYTES", str(500_000)))
+VISION_FORMAT    = os.getenv("VISION_FORMAT", "JPEG").upper()     # "JPEG" | "WEBP"
+
+VISION_QUALITIES = (85, 75, 65, 50)
+
+# Se incrementa al cambiar el preprocesado para OCR: invalida los textos guardados
+OCR_PREPROCESS_VERSION = 1
+
+def _otsu_threshold(img: Image.Image) -> int:
+    # Umbral de Otsu sobre el histograma de una imagen en escala de grises
+    hist  = img.histogram()
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg, weight_bg = 0.0, 0
+    best, threshold = 0.0, 127
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+def _ocr_scale(size: Tuple[int, int], dpi: Optional[float]) -> float:
+    width, height = size
+    scale = 1.0
+    # Solo se reescala por DPI cuando la imagen lo declara; si no, solo se aplica el límite de píxeles
+    if dpi and dpi > 0:
+        scale = min(2.0, max(0.25, OCR_TARGET_DPI / dpi))
+    if width * height * scale ** 2 > OCR_MAX_PIXELS:
+        scale = math.sqrt(OCR_MAX_PIXELS / (width * height))
+    return scale
+
+def prepare_for_ocr(img: Image.Image) -> Image.Image:
+    # Variante para Tesseract: orientación EXIF, gris, DPI objetivo y binarizado
+    if not OCR_PREPROCESS:
+        return img
+    start = time.perf_counter()
+    original_size = img.size
+    dpi = img.info.get("dpi", (None,))[0]
+
+    img = ImageOps.exif_transpose(img).convert("L")
+    scale = _ocr_scale(img.size, dpi)
+    if abs(scale - 1) > 0.05:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    if OCR_BINARIZE:
+        img = ImageOps.autocontrast(img)
+        threshold = _otsu_threshold(img)
+        img = img.point(lambda p: 255 if p > threshold else 0, mode="1")
+
+    logger.info(
+        f"Preprocesado OCR: {original_size[0]}x{original_size[1]} -> {img.width}x{img.height} "
+        f"en {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return img
+
+def _encode(img: Image.Image, quality: int) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format=VISION_FORMAT, quality=quality, optimize=True)
+    return buf.getvalue()
+
+def prepare_for_vision(data: bytes, src: Optional[Image.Image] = None) -> Tuple[bytes, str]:
+    # Variante para Gemini Vision: imagen compacta dentro de VISION_MAX_BYTES.
+    # Devuelve (bytes, mime_type); si no se gana nada se envía el original.
+    # `src` es la imagen ya decodificada, si se tiene (no se modifica).
+    start = time.perf_counter()
+    if src is None:
+        src = Image.open(BytesIO(data))
+    original_mime = Image.MIME.get(src.format, "image/jpeg")
+
+    img = ImageOps.exif_transpose(src)
+    if img.mode in ("RGBA", "LA", "P"):
+        # Transparencias sobre fondo blanco (JPEG no tiene canal alfa)
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    else:
+        img = img.convert("RGB")
+    img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+
+    out = b""
+    for _ in range(3):
+        for quality in VISION_QUALITIES:
+            out = _encode(img, quality)
+            if len(out) <= VISION_MAX_BYTES:
+                break
+        if len(out) <= VISION_MAX_BYTES:
+            break
+        img = img.resize((max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75))), Image.LANCZOS)
+
+    elapsed = (time.perf_counter() - start) * 1000
+    if len(out) >= len(data):
+        logger.info(f"Preprocesado visión: se envía el original ({len(data)} bytes, {elapsed:.0f} ms)")
+        return data, original_mime
+
+    logger.info(
+        f"Preprocesado visión: {len(data)} -> {len(out)} bytes "
+        f"({100 * (1 - len(out) / len(data)):.0f}% ahorrado) en {elapsed:.0f} ms"
+    )
+    return out, Image.MIME[VISION_FORMAT]
@@ -0,0 +1,52 @@
+# backend/ratelimit.py
+import time
+import math
+import threading
+from typing import Dict, List, Optional
+
+class RateLimiter:
+    # Ventana deslizante aproximada (dos contadores por clave): memoria O(claves)
+    # y coste O(1) por intento. Es por worker, no compartida entre procesos.
+    def __init__(self, limit: int, window: float):
+        self.limit    = limit
+        self.window   = window
+        self.rejected = 0
+        self._counts: Dict[str, List[int]] = {}   # clave -> [ventana, actual, anterior]
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, record: bool = True) -> Optional[float]:
+        """Registra un intento. Devuelve None si se permite o los segundos a esperar.
+        Con record=False solo comprueba el límite, sin contar el intento."""
+        now = time.monotonic()
+        current = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        with self._lock:
+            self._prune(current)
+            entry = self._counts.get(key)
+            if entry is None or entry[0] < current - 1:
+                entry = [current, 0, 0]
+            elif entry[0] == current - 1:
+                entry = [current, 0, entry[1]]
+            estimated = entry[2] * (1 - elapsed) + entry[1]
+            if estimated >= self.limit:
+                self._counts[key] = entry
+                self.rejected += 1
+                return math.ceil((1 - elapsed) * self.window)
+            if record:
+                entry[1] += 1
+                self._counts[key] = entry
+            return None
+
+    def _prune(self, current: int):
+        # Una vez por ventana se olvidan las claves sin actividad reciente
+        if current == self._last_prune:
+            return
+        self._last_prune = current
+        stale = [k for k, v in self._counts.items() if v[0] < current - 1]
+        for k in stale:
+            del self._counts[k]
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "window_s": self.window, "tracked_keys": len(self._counts), "rejected": self.rejected}
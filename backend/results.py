@@ -0,0 +1,184 @@
+# backend/results.py
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from cache import CACHE_BACKEND, CACHE_DB_PATH
+from ocr_engine import OCR_CONFIG
+from preprocess import OCR_PREPROCESS, OCR_BINARIZE, OCR_TARGET_DPI, OCR_MAX_PIXELS, OCR_PREPROCESS_VERSION
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# Configuración (desde variables de entorno)
+# --------------------------------------------------
+RESULTS_ENABLED      = os.getenv("RESULTS_ENABLED", "1") == "1" and CACHE_BACKEND != "memory"
+RESULTS_MAX_BYTES    = int(os.getenv("RESULTS_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULTS_TOUCH_EVERY  = float(os.getenv("RESULTS_TOUCH_EVERY", "3600"))  # segundos entre actualizaciones de accessed_at
+
+FIELDS = ("ocr_text", "corrected_text", "description")
+
+# Todo lo que cambia el texto de Tesseract: su configuración y el preprocesado de la imagen
+OCR_SETTINGS = "|".join(map(str, (
+    OCR_CONFIG, OCR_PREPROCESS_VERSION, OCR_PREPROCESS, OCR_BINARIZE, OCR_TARGET_DPI, OCR_MAX_PIXELS,
+)))
+
+# --------------------------------------------------
+# Almacén de resultados direccionado por contenido: hash de la imagen +
+# configuración de OCR y preprocesado -> texto OCR, texto corregido y descripción. Una
+# imagen ya procesada no vuelve a pasar por Tesseract ni por Gemini.
+# Cada campo se guarda en cuanto se conoce (solo los que produjo Gemini, no
+# los del corrector local o los fallbacks), así que una subida repetida
+# reutiliza lo que haya y calcula solo lo que falte.
+# --------------------------------------------------
+class ResultStore:
+    # Cada cuántas escrituras se comprueba el límite de tamaño
+    EVICT_EVERY = 20
+
+    def __init__(self, ocr_settings: str = OCR_SETTINGS, path: str = CACHE_DB_PATH,
+                 maxbytes: int = RESULTS_MAX_BYTES, enabled: bool = RESULTS_ENABLED):
+        self.enabled   = enabled
+        self.path      = path
+        self.maxbytes  = maxbytes
+        # Otra configuración de Tesseract o del preprocesado da otro texto: forma parte de la clave
+        self.namespace = hashlib.md5(ocr_settings.encode()).hexdigest()[:12]
+        self.hits      = 0
+        self.partial   = 0
+        self.misses    = 0
+        self.errors    = 0
+        self.evictions = 0
+        self._writes   = 0
+        self._local    = threading.local()
+        if not enabled:
+            return
+        try:
+            self._conn().execute("""
+                CREATE TABLE IF NOT EXISTS result_store (
+                    key            TEXT PRIMARY KEY,
+                    ocr_text       TEXT,
+                    corrected_text TEXT,
+                    description    TEXT,
+                    nbytes         INTEGER NOT NULL,
+                    accessed_at    REAL NOT NULL
+                )
+            """)
+            self._conn().execute("CREATE INDEX IF NOT EXISTS result_store_accessed ON result_store (accessed_at)")
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo abrir el almacén de resultados en {path}: {e}")
+            self.enabled = False
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión heredada de otro proceso (fork de gunicorn --preload) no se reutiliza
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.2, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid  = os.getpid()
+        return conn
+
+    def _key(self, content_hash: str) -> str:
+        return f"{self.namespace}:{content_hash}"
+
+    def get(self, content_hash: str) -> Dict[str, str]:
+        # Devuelve los campos conocidos (puede estar vacío). Bloqueante: desde
+        # código async, con asyncio.to_thread.
+        if not self.enabled:
+            return {}
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT ocr_text, corrected_text, description, accessed_at FROM result_store WHERE key = ?",
+                (self._key(content_hash),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return {}
+            # La antigüedad de acceso solo decide la expulsión: basta con refrescarla de vez en cuando
+            if now - row[3] > RESULTS_TOUCH_EVERY:
+                conn.execute("UPDATE result_store SET accessed_at = ? WHERE key = ?", (now, self._key(content_hash)))
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo almacén de resultados: {e}")
+            self.errors += 1
+            self.misses += 1
+            return {}
+        found = {field: value for field, value in zip(FIELDS, row) if value is not None}
+        if len(found) == len(FIELDS):
+            self.hits += 1
+        else:
+            self.partial += 1
+        return found
+
+    def put(self, content_hash: str, **fields: Optional[str]):
+        # Añade campos sin borrar los ya guardados (None = sin cambios)
+        values = [fields.get(field) for field in FIELDS]
+        if not self.enabled or all(value is None for value in values):
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("""
+                INSERT INTO result_store (key, ocr_text, corrected_text, description, nbytes, accessed_at)
+                VALUES (?, ?, ?, ?, 0, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    ocr_text       = COALESCE(excluded.ocr_text, ocr_text),
+                    corrected_text = COALESCE(excluded.corrected_text, corrected_text),
+                    description    = COALESCE(excluded.description, description),
+                    accessed_at    = excluded.accessed_at
+            """, (self._key(content_hash), *values, now))
+            conn.execute("""
+                UPDATE result_store SET nbytes = LENGTH(key)
+                    + COALESCE(LENGTH(CAST(ocr_text AS BLOB)), 0)
+                    + COALESCE(LENGTH(CAST(corrected_text AS BLOB)), 0)
+                    + COALESCE(LENGTH(CAST(description AS BLOB)), 0)
+                WHERE key = ?
+            """, (self._key(content_hash),))
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Error escribiendo almacén de resultados: {e}")
+            self.errors += 1
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Por tamaño: se conservan las entradas usadas más recientemente hasta maxbytes
+        cur = conn.execute("""
+            DELETE FROM result_store WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(nbytes) OVER (ORDER BY accessed_at DESC, key) AS running
+                    FROM result_store
+                ) WHERE running > ?
+            )
+        """, (self.maxbytes,))
+        if cur.rowcount > 0:
+            self.evictions += cur.rowcount
+            logger.info(f"Almacén de resultados: {cur.rowcount} entradas expulsadas por tamaño")
+
+    def stats(self) -> Dict[str, int]:
+        if not self.enabled:
+            return {"enabled": False}
+        try:
+            size, nbytes = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM result_store"
+            ).fetchone()
+        except sqlite3.Error:
+            size, nbytes = 0, 0
+        return {
+            "enabled":   True,
+            "size":      size,
+            "bytes":     nbytes,
+            "max_bytes": self.maxbytes,
+            "hits":      self.hits,
+            "partial":   self.partial,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "errors":    self.errors,
+        }
+
+result_store = ResultStore()
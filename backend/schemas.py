@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 
 # --- Schemas para autenticación ---
 
@@ -44,4 +44,22 @@ class UserSettingsOut(UserSettingsBase):
     user_id: int
 
     class Config:
-        orm_mode = True  # no hace daño, puedes dejarlo
\ No newline at end of file
+        orm_mode = True  # no hace daño, puedes dejarlo
+
+class UserSettingsPatch(BaseModel):
+    # Actualización parcial: solo se escriben los campos presentes
+    font_size: Optional[str] = None
+    font_family: Optional[str] = None
+    text_color: Optional[str] = None
+    background_color: Optional[str] = None
+    rate: Optional[str] = None
+    pitch: Optional[str] = None
+    volume: Optional[str] = None
+
+# --- Schemas para administración ---
+
+class AdminBulkAction(BaseModel):
+    # "delete" borra los usuarios; "set_admin" les asigna is_admin
+    action: Literal["delete", "set_admin"]
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    is_admin: Optional[int] = None
@@ -0,0 +1,68 @@
+# backend/singleflight.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    # Agrupa llamadas concurrentes con la misma clave: la primera lanza el trabajo
+    # y el resto espera el mismo resultado (o la misma excepción).
+    def __init__(self, name: str):
+        self.name      = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leaders   = 0
+        self.shared    = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        # Un trabajo abandonado (cancelándose) o ya terminado no se comparte:
+        # quien llega ahora recibiría su CancelledError
+        if task is not None and (task.done() or task.cancelling()):
+            task = None
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # shield: si un cliente se desconecta no cancela el trabajo de los demás;
+        # si era el último que lo esperaba, el trabajo (p. ej. la llamada a
+        # Gemini) se cancela porque ya no hay nadie que use el resultado
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                self.abandoned += 1
+                task.cancel()
+                # Fuera ya de _calls: la cancelación tarda varias vueltas del
+                # event loop y una llamada nueva no debe unirse a este trabajo
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _done(self, key: str, task: asyncio.Task):
+        # La clave puede pertenecer ya a otro trabajo (si este se abandonó)
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marca la excepción como consumida aunque todos los clientes se hayan ido
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Single-flight {self.name} ({key}) terminó con error: {task.exception()}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders":   self.leaders,
+            "shared":    self.shared,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# Los módulos del backend se importan como en main.py (desde backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
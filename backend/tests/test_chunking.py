@@ -0,0 +1,39 @@
+# backend/tests/test_chunking.py
+import random
+
+from chunking import split_text, stitch
+
+def _document(paragraphs: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    words = ["el", "documento", "texto", "página", "corrección", "escaneado", "línea", "tabla", "imagen", "datos"]
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(20, 120))) + "."
+        for _ in range(paragraphs)
+    ]
+
+def test_stitch_restores_original_text():
+    text = "\n\n".join(_document(60)) + "\n"
+    chunks = split_text(text, max_chars=4000, target=1500)
+    assert len(chunks) > 1
+    assert stitch(chunks, [c.body for c in chunks]) == text
+
+def test_chunks_respect_max_chars():
+    chunks = split_text("\n\n".join(_document(60)), max_chars=1000, target=1500)
+    assert all(len(c.body) <= 1000 for c in chunks)
+
+def test_editing_one_paragraph_only_changes_its_chunk():
+    paragraphs = _document(80)
+    before = [c.body for c in split_text("\n\n".join(paragraphs), max_chars=4000, target=1500)]
+    paragraphs[10] = "Un párrafo nuevo, bastante más corto."
+    after = [c.body for c in split_text("\n\n".join(paragraphs), max_chars=4000, target=1500)]
+    # Los trozos posteriores a la edición siguen siendo los mismos (y su caché vale)
+    changed = set(after) - set(before)
+    assert len(changed) == 1
+    assert paragraphs[10] in changed.pop()
+
+def test_text_that_fits_is_a_single_chunk():
+    text = "\n\n".join(_document(5)) + "\n"
+    assert len(text) <= 4000
+    chunks = split_text(text, max_chars=4000, target=1500)
+    assert len(chunks) == 1
+    assert stitch(chunks, [c.body for c in chunks]) == text
@@ -0,0 +1,56 @@
+# backend/tests/test_local_correction.py
+import pytest
+
+from local_correction import LocalCorrector
+
+pytest.importorskip("spellchecker")
+
+@pytest.fixture(scope="module")
+def corrector():
+    c = LocalCorrector(languages=["es", "en"])
+    c.load()
+    return c
+
+# Formas verbales correctas que no están en el diccionario de lemas y que la
+# corrección por distancia de edición cambiaba por otra palabra real
+@pytest.mark.parametrize("word", [
+    "tiene", "puede", "quiero", "puedo", "viene",
+    "sigue", "juega", "piensa", "encuentra", "sería",
+])
+def test_inflected_spanish_words_are_kept(corrector, word):
+    assert corrector.correct(word).text == word
+    assert corrector.correct(word.capitalize()).text == word.capitalize()
+
+def test_sentence_with_irregular_verbs_is_unchanged(corrector):
+    text = (
+        "La casa tiene una puerta. Si puedo, vendré mañana; mi hermano sigue "
+        "enfermo y dice que no quiere salir. Sería mejor que juegue en casa."
+    )
+    result = corrector.correct(text)
+    assert result.text == text
+    assert result.corrected == 0
+
+@pytest.mark.parametrize("wrong, right", [
+    ("inforrn", "inform"),
+    ("c0mo", "como"),
+    ("cuand0", "cuando"),
+    ("Inforrnation", "Information"),
+])
+def test_ocr_confusions_are_fixed(corrector, wrong, right):
+    assert corrector.correct(wrong).text == right
+
+# Erratas sin confusión OCR: solo se corrigen por distancia de edición, que
+# necesita las listas de formas completas de wordfreq
+@pytest.mark.parametrize("wrong, right", [
+    ("wiil", "will"),
+    ("c0mpartido", "compartido"),
+    ("documentto", "documento"),
+    ("tomorow", "tomorrow"),
+])
+def test_typos_are_fixed(corrector, wrong, right):
+    pytest.importorskip("wordfreq")
+    assert corrector.correct(wrong).text == right
+
+def test_codes_and_numbers_are_kept(corrector):
+    text = "Ref. 2024-A15, importe 1.250 EUR"
+    assert corrector.correct(text).text == text
@@ -0,0 +1,46 @@
+# backend/tests/test_singleflight.py
+import asyncio
+
+from singleflight import SingleFlight
+
+async def _slow_call(cancelled: list):
+    # Como GeminiGateway.generate: la cancelación tarda varias vueltas del
+    # event loop en deshacer timeout + wait_for
+    try:
+        async with asyncio.timeout(5):
+            await asyncio.wait_for(asyncio.sleep(0.05), timeout=5)
+        return "ok"
+    except asyncio.CancelledError:
+        cancelled.append(True)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        raise
+
+def test_shared_call_survives_one_waiter_leaving():
+    async def scenario():
+        flight, cancelled = SingleFlight("test"), []
+        first  = asyncio.create_task(flight.do("k", lambda: _slow_call(cancelled)))
+        second = asyncio.create_task(flight.do("k", lambda: _slow_call(cancelled)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "ok"
+        assert not cancelled
+
+    asyncio.run(scenario())
+
+def test_call_after_abandon_starts_a_new_flight():
+    async def scenario():
+        flight, cancelled = SingleFlight("test"), []
+        first = asyncio.create_task(flight.do("k", lambda: _slow_call(cancelled)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        # Llega mientras el trabajo abandonado aún se está cancelando
+        result = await flight.do("k", lambda: _slow_call(cancelled))
+        assert result == "ok"
+        assert cancelled == [True]
+        assert flight.stats()["abandoned"] == 1
+        await asyncio.sleep(0.01)
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())